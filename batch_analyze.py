@@ -0,0 +1,251 @@
+# batch_analyze.py
+"""
+Headless analysis of many match videos.
+
+    python batch_analyze.py videos/ "matches/*.mp4" --out analysis --workers 4
+
+Each clip gets its own folder under --out with detections.npz, heatmap.png
+and, with --commentary, commentary.json (plus WAV files with --audio).
+With --export parquet|arrow, match/ holds the detections, per-frame counts,
+ball proximity and commentary as columnar tables (see match_export.py).
+
+Detection and heatmaps run on the worker pool. Commentary runs in the main
+process as clips finish, so the commentary model (about 4.4 GB of RAM)
+is loaded once, not once per worker.
+Clips whose folder already has a done.json are skipped unless --force is
+given, so an interrupted run can simply be restarted.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from detection_cache import DetectionCache, cache_key, file_hash
+from detection_store import DetectionStore
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+DEFAULT_WEIGHTS = Path(__file__).resolve().parent / "weights" / "best.pt"
+TASKS = ("Detection", "Segmentation", "Pose Estimation")
+
+# Per-process state, set up once by _init_worker
+_model = None
+_options = None
+
+
+def find_videos(inputs):
+    """
+    Expands directories and glob patterns into a sorted list of video files.
+    """
+    videos = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = path.rglob("*")
+        else:
+            candidates = (Path(p) for p in glob.glob(item, recursive=True))
+        videos.update(p.resolve() for p in candidates if p.suffix.lower() in VIDEO_EXTENSIONS)
+    return sorted(videos)
+
+
+def clip_dir(out_dir, video_path):
+    return Path(out_dir) / f"{video_path.stem}-{file_hash(video_path)[:8]}"
+
+
+def _init_worker(options):
+    # Load the model once per worker process; it is reused for every clip
+    global _model, _options
+    import matplotlib
+    matplotlib.use("Agg")
+    from model_registry import get_model
+    _options = options
+    _model = get_model(options["weights"])
+
+
+def analyse_clip(video_path, out_dir):
+    # Detection and heatmap for one clip, in a worker process
+    from kdeplot import detect_video_positions, generate_kde_plot
+    from video_engine import FrameSampler
+    from pitch_calibration import load_calibration
+    import matplotlib.pyplot as plt
+
+    options = _options
+    timings = {}
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    sampler = FrameSampler(options["sampling"], **options["sampler_options"])
+    key = cache_key(video_path, options["weights"], options["task"], options["conf"], sampling=sampler.key())
+    cache = DetectionCache()
+    store = cache.get(key)
+    if store is None:
+        store = detect_video_positions(video_path, _model, options["conf"], sampler=sampler)
+        cache.put(key, store)
+    store.save(out_dir / "detections.npz")
+    timings["detection_s"] = time.perf_counter() - start
+
+    # A pitch calibration saved from the app places points by the video's homography
+    calibration = load_calibration(video_path)
+    start = time.perf_counter()
+    fig = generate_kde_plot(str(video_path), options["weights"], detections=store, calibration=calibration)
+    if fig:
+        fig.savefig(out_dir / "heatmap.png", dpi=100)
+        plt.close(fig)
+    timings["heatmap_s"] = time.perf_counter() - start
+
+    return {
+        "video": str(video_path),
+        "frames": len(store),
+        "frames_analysed": int(store.analysed_frames().size),
+        "detections": store.num_detections,
+        "timings": timings,
+    }
+
+
+def finish_clip(video_path, out_dir, summary, options):
+    """
+    Commentary, audio and export for a clip whose detections are done.
+    Runs in the main process, one clip at a time, so TinyLlama is loaded
+    once for the whole run instead of once per worker.
+    """
+    from pitch_calibration import load_calibration
+
+    timings = summary["timings"]
+    calibration = load_calibration(video_path)
+    store = None
+    if options["commentary"] or options["export"]:
+        store = DetectionStore.load(out_dir / "detections.npz")
+
+    lines = None
+    if options["commentary"]:
+        from commentary_generator import generate_commentary_batch
+        from extract_positions import extract_positions_batch
+        from proximity import compute_proximity, PROXIMITY_THRESHOLD_M
+
+        start = time.perf_counter()
+        frame_ids = list(range(0, len(store), options["commentary_every"]))
+        frame_ids = list(dict.fromkeys(store.nearest_analysed(frame_ids).tolist()))
+        positions_list = extract_positions_batch(store, frame_ids)
+        proximity = compute_proximity(store) if calibration is None else \
+            compute_proximity(store, PROXIMITY_THRESHOLD_M, calibration=calibration)
+        for frame_id, positions in zip(frame_ids, positions_list):
+            positions["frame_id"] = frame_id
+            positions["ball_proximity"] = proximity.entity(frame_id)
+        commentaries = generate_commentary_batch(positions_list)
+        lines = [{"frame_id": f, "commentary": c} for f, c in zip(frame_ids, commentaries)]
+        timings["commentary_s"] = time.perf_counter() - start
+
+        if options["audio"]:
+            from text_to_audio import generate_audio
+            start = time.perf_counter()
+            for line in lines:
+                audio_name = f"commentary_{line['frame_id']:06d}.wav"
+                (out_dir / audio_name).write_bytes(generate_audio(line["commentary"]))
+                line["audio"] = audio_name
+            timings["audio_s"] = time.perf_counter() - start
+
+        with open(out_dir / "commentary.json", "w") as f:
+            json.dump(lines, f, indent=2)
+
+    if options["export"]:
+        from match_export import export_match
+        import cv2
+
+        start = time.perf_counter()
+        video_cap = cv2.VideoCapture(str(video_path))
+        fps = video_cap.get(cv2.CAP_PROP_FPS) or None
+        video_cap.release()
+        export_match(out_dir / "match", store, fps=fps, calibration=calibration,
+                     commentary=lines, format=options["export"],
+                     video=Path(video_path).name, task=options["task"], conf=options["conf"])
+        timings["export_s"] = time.perf_counter() - start
+
+    summary["timings"] = {name: round(value, 3) for name, value in timings.items()}
+    # Written last: its presence marks the clip as complete
+    with open(out_dir / "done.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Analyse football match videos without the UI.")
+    parser.add_argument("inputs", nargs="+", help="Video files, directories or glob patterns")
+    parser.add_argument("--out", default="analysis", help="Output directory (default: analysis)")
+    parser.add_argument("--weights", default=str(DEFAULT_WEIGHTS), help="YOLO weights file")
+    parser.add_argument("--task", default="Detection", choices=TASKS)
+    parser.add_argument("--conf", type=float, default=0.4, help="Model confidence (default: 0.4)")
+    parser.add_argument("--workers", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--sampling", default="all", choices=("all", "stride", "target_fps", "motion"))
+    parser.add_argument("--stride", type=int, default=5, help="Frame stride for --sampling stride")
+    parser.add_argument("--target-fps", type=float, default=5.0, help="Frames per second for --sampling target_fps")
+    parser.add_argument("--motion-threshold", type=float, default=6.0,
+                        help="Mean grayscale frame difference (0-255) for --sampling motion")
+    parser.add_argument("--commentary", action="store_true", help="Also write commentary.json")
+    parser.add_argument("--commentary-every", type=int, default=30, help="Frames between commentary lines")
+    parser.add_argument("--audio", action="store_true", help="Also synthesize commentary audio")
+    parser.add_argument("--export", choices=("parquet", "arrow"),
+                        help="Also write match data (detections, counts, proximity, commentary) to match/")
+    parser.add_argument("--force", action="store_true", help="Re-analyse clips that are already done")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("No videos found.")
+        return 1
+
+    sampler_options = {}
+    if args.sampling == "stride":
+        sampler_options["stride"] = args.stride
+    elif args.sampling == "target_fps":
+        sampler_options["target_fps"] = args.target_fps
+    elif args.sampling == "motion":
+        sampler_options["motion_threshold"] = args.motion_threshold
+    options = {
+        "weights": args.weights,
+        "task": args.task,
+        "conf": args.conf,
+        "sampling": args.sampling,
+        "sampler_options": sampler_options,
+        "commentary": args.commentary or args.audio,
+        "commentary_every": args.commentary_every,
+        "audio": args.audio,
+        "export": args.export,
+    }
+
+    todo = []
+    for video in videos:
+        out_dir = clip_dir(args.out, video)
+        if (out_dir / "done.json").exists() and not args.force:
+            print(f"skip  {video.name} (already analysed)")
+            continue
+        todo.append((video, out_dir))
+    print(f"{len(todo)} of {len(videos)} clips to analyse with {args.workers} workers")
+
+    failed = 0
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                             initializer=_init_worker, initargs=(options,)) as pool:
+        futures = {pool.submit(analyse_clip, video, out_dir): (video, out_dir) for video, out_dir in todo}
+        for future in as_completed(futures):
+            video, out_dir = futures[future]
+            try:
+                # Commentary runs here while the workers carry on with detection
+                summary = finish_clip(video, out_dir, future.result(), options)
+                print(f"done  {video.name}: {summary['frames']} frames, {summary['timings']}")
+            except Exception as e:
+                failed += 1
+                print(f"fail  {video.name}: {e}")
+    print(f"Finished in {time.perf_counter() - start:.1f}s, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
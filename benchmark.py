@@ -0,0 +1,300 @@
+# benchmark.py
+"""
+Benchmarks for each stage of the pipeline, run in isolation.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json      # fail on regressions
+
+Model stages run on the bundled clip (videos/input.mp4); post-processing,
+KDE and commentary stages run on synthetic detections. Stages whose
+dependencies or weights are missing are reported as skipped.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_VIDEO = ROOT / "videos" / "input.mp4"
+DEFAULT_WEIGHTS = ROOT / "weights" / "best.pt"
+
+STAGES = {}
+
+
+def stage(name):
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+
+class PeakRSS:
+    """
+    Samples the resident set size on a background thread and keeps the peak.
+    """
+    def __init__(self, interval=0.01):
+        import psutil
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def timed_calls(fn, items, items_per_call=1):
+    """
+    Calls fn once per item and summarizes the per-call latency.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        call_start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - call_start)
+    total = time.perf_counter() - start
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "throughput_per_s": round(len(latencies) * items_per_call / total, 2) if total > 0 else 0.0,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def synthetic_store(frames=1500, players=20, seed=0, frame_size=(720, 405)):
+    """
+    DetectionStore with players, goalkeepers, referees and a ball moving
+    smoothly across the frame, for stages that should not depend on a model.
+    """
+    from detection_store import DetectionStore
+    rng = np.random.default_rng(seed)
+    width, height = frame_size
+    cls = np.array([0] * players + [1, 1, 2, 3, 4, 4, 5])
+    n = len(cls)
+    pos = rng.random((n, 2)) * frame_size
+    vel = rng.normal(0, 2, (n, 2))
+    store = DetectionStore(frame_size=frame_size)
+    for _ in range(frames):
+        pos = np.clip(pos + vel, 0, frame_size)
+        vel += rng.normal(0, 0.3, (n, 2))
+        keep = rng.random(n) > 0.05
+        xywh = np.hstack([pos, np.tile([20.0, 40.0], (n, 1))])[keep]
+        store.append_frame(cls[keep], rng.uniform(0.3, 0.95, keep.sum()), xywh)
+    return store
+
+
+def read_frames(video_path, count, frame_size=(720, 405)):
+    import cv2
+    video_cap = cv2.VideoCapture(str(video_path))
+    frames = []
+    while len(frames) < count:
+        success, image = video_cap.read()
+        if not success:
+            break
+        frames.append(cv2.resize(image, frame_size))
+    video_cap.release()
+    if not frames:
+        raise IOError(f"Could not read video: {video_path}")
+    return frames
+
+
+@stage("predict_per_frame")
+def bench_predict_per_frame(args):
+    from model_registry import get_model
+    model = get_model(args.weights)
+    frames = read_frames(args.video, args.frames)
+    return timed_calls(lambda image: model.predict(image, conf=0.4, verbose=False), frames)
+
+
+@stage("predict_batched")
+def bench_predict_batched(args):
+    from model_registry import get_model
+    model = get_model(args.weights)
+    frames = read_frames(args.video, args.frames)
+    batches = [frames[i:i + args.batch_size] for i in range(0, len(frames), args.batch_size)]
+    result = timed_calls(lambda batch: model.predict(batch, conf=0.4, verbose=False), batches,
+                         items_per_call=args.batch_size)
+    result["batch_size"] = args.batch_size
+    return result
+
+
+@stage("extract_positions")
+def bench_extract_positions(args):
+    from extract_positions import extract_positions
+    store = synthetic_store(args.synthetic_frames)
+    return timed_calls(extract_positions, store)
+
+
+@stage("extract_positions_batch")
+def bench_extract_positions_batch(args):
+    from extract_positions import extract_positions_batch
+    store = synthetic_store(args.synthetic_frames)
+    return timed_calls(extract_positions_batch, [store] * 5, items_per_call=len(store))
+
+
+@stage("find_ball_proximity")
+def bench_find_ball_proximity(args):
+    from extract_positions import extract_positions_batch, find_ball_proximity
+    positions = extract_positions_batch(synthetic_store(args.synthetic_frames))
+    return timed_calls(find_ball_proximity, positions)
+
+
+@stage("compute_proximity")
+def bench_compute_proximity(args):
+    from proximity import compute_proximity
+    store = synthetic_store(args.synthetic_frames)
+    return timed_calls(compute_proximity, [store] * 5, items_per_call=len(store))
+
+
+@stage("generate_kde_plot")
+def bench_generate_kde_plot(args):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from kdeplot import generate_kde_plot
+    store = synthetic_store(args.synthetic_frames)
+    return timed_calls(lambda _: plt.close(generate_kde_plot(None, None, detections=store)), range(3))
+
+
+@stage("generate_commentary")
+def bench_generate_commentary(args):
+    from commentary_generator import generate_commentary, get_commentator
+    from extract_positions import extract_positions_batch
+    get_commentator()
+    store = synthetic_store(args.commentary_calls * 30)
+    positions = extract_positions_batch(store, range(0, len(store), 30))
+    for frame_id, p in enumerate(positions):
+        p["frame_id"] = frame_id * 30
+    return timed_calls(generate_commentary, positions)
+
+
+@stage("generate_audio")
+def bench_generate_audio(args):
+    from text_to_audio import generate_audio
+    lines = [f"Commentary line number {i}: the players hold their shape." for i in range(args.audio_calls)]
+    return timed_calls(generate_audio, lines)
+
+
+@stage("job_scheduler")
+def bench_job_scheduler(args):
+    # Several sessions submitting distinct runs at once; latency is submit to finish
+    from job_scheduler import JobScheduler, FAILED
+    import cv2
+    if not cv2.VideoCapture(str(args.video)).isOpened():
+        raise OSError(f"Could not read video: {args.video}")
+    scheduler = JobScheduler(max_concurrent=args.job_slots)
+    start = time.perf_counter()
+    jobs = [scheduler.submit(f"user-{i}", args.video, args.weights, "Detection", 0.3 + 0.01 * i,
+                             {"mode": "stride", "stride": 10})
+            for i in range(args.users)]
+    for job in jobs:
+        job.wait()
+    total = time.perf_counter() - start
+    scheduler.shutdown()
+    failed = [job for job in jobs if job.status == FAILED]
+    if failed:
+        raise OSError(str(failed[0].error))
+    latencies = np.asarray([job.finished - job.created for job in jobs]) * 1000
+    return {
+        "calls": len(jobs),
+        "throughput_per_s": round(len(jobs) / total, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "users": args.users,
+        "job_slots": args.job_slots,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions against a baseline: throughput down or p90 latency up by
+    more than tolerance (a fraction).
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or "skipped" in result or "skipped" in base:
+            continue
+        if result["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput_per_s']} < baseline {base['throughput_per_s']}")
+        if result["p90_ms"] > base["p90_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p90 {result['p90_ms']} ms > baseline {base['p90_ms']} ms")
+    return regressions
+
+
+def run(names, args):
+    results = {}
+    for name in names:
+        print(f"running {name} ...", file=sys.stderr)
+        try:
+            with PeakRSS() as rss:
+                result = STAGES[name](args)
+            result["peak_rss_mb"] = round(rss.peak / 1e6, 1)
+        except (ImportError, OSError) as e:
+            result = {"skipped": str(e)}
+        results[name] = result
+    return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline stages.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--video", default=str(DEFAULT_VIDEO))
+    parser.add_argument("--weights", default=str(DEFAULT_WEIGHTS))
+    parser.add_argument("--frames", type=int, default=120, help="Video frames for the model stages")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--synthetic-frames", type=int, default=1500)
+    parser.add_argument("--commentary-calls", type=int, default=5)
+    parser.add_argument("--audio-calls", type=int, default=5)
+    parser.add_argument("--users", type=int, default=4, help="Concurrent sessions for job_scheduler")
+    parser.add_argument("--job-slots", type=int, default=2)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a saved results file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed regression (default: 0.15)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": run(args.stages, args),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(report["stages"], baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,165 @@
-from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
+import threading
+import time
+from collections import OrderedDict
+
 from extract_positions import find_ball_proximity
+from profiling import profiler
+
+MODEL_NAME = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
 
-# Load TinyLlama model and tokenizer
-tokenizer = AutoTokenizer.from_pretrained("TinyLlama/TinyLlama-1.1B-Chat-v1.0")
-model = AutoModelForCausalLM.from_pretrained("TinyLlama/TinyLlama-1.1B-Chat-v1.0")
-commentator = pipeline("text-generation", model=model, tokenizer=tokenizer)
+# TinyLlama is loaded on first use and shared by the whole process
+_commentator = None
+_commentator_lock = threading.Lock()
+# Separate from _commentator_lock, which is held for the whole model load
+_prewarm_lock = threading.Lock()
+_prewarm_thread = None
+load_seconds = None
 
 last_commentary = ""
 
-def generate_commentary(positions):
-    global last_commentary
+# Sampling settings for every generated commentary line
+GENERATION_KWARGS = dict(
+    max_new_tokens=60,
+    num_return_sequences=1,
+    do_sample=True,
+    top_k=30,
+    top_p=0.85,
+    temperature=0.7,
+    repetition_penalty=2.0
+)
+
+FALLBACK_COMMENTARY = (
+    "Players hold their ground as action continues. "
+    "The teams are positioning themselves for the next move."
+)
+
+class CommentaryCache:
+    """
+    Bounded LRU cache of generated commentary keyed on a scene signature.
+    Each key keeps up to `variants` generations and serves them in rotation,
+    so repeated scenes do not always get the same line.
+    """
+    def __init__(self, max_keys=256, variants=3):
+        self.max_keys = max_keys
+        self.variants = max(1, variants)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def missing(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return self.variants - (len(entry[0]) if entry else 0)
+
+    def add(self, key, commentary):
+        with self._lock:
+            entry = self._entries.setdefault(key, [[], 0])
+            if len(entry[0]) < self.variants:
+                entry[0].append(commentary)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def take(self, key):
+        """
+        Next cached variant for key, or None if nothing is cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or not entry[0]:
+                return None
+            self._entries.move_to_end(key)
+            texts, turn = entry
+            entry[1] = turn + 1
+            return texts[turn % len(texts)]
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "keys": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+# Shared by all sessions; replace to change its size or number of variants
+commentary_cache = CommentaryCache()
+
+def usable_commentary(commentary):
+    # Empty or repetitive generations are replaced by the fallback line
+    return bool(commentary) and len(set(commentary.split())) >= 10
+
+def scene_signature(situation, entity=None):
+    """
+    Canonical cache key for a frame: its situation sentences and the
+    entity nearest the ball. The frame ID is deliberately left out.
+    """
+    return (tuple(sorted(situation)), entity)
+
+def get_commentator():
+    """
+    Returns the text-generation pipeline, loading TinyLlama on the first call.
+    """
+    global _commentator, load_seconds
+    if _commentator is None:
+        with _commentator_lock:
+            if _commentator is None:
+                start = time.perf_counter()
+                from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+                model = AutoModelForCausalLM.from_pretrained(MODEL_NAME)
+                # Batched generation pads prompts on the left
+                if tokenizer.pad_token is None:
+                    tokenizer.pad_token = tokenizer.eos_token
+                tokenizer.padding_side = "left"
+                _commentator = pipeline("text-generation", model=model, tokenizer=tokenizer)
+                load_seconds = time.perf_counter() - start
+    return _commentator
+
+def prewarm_commentary():
+    """
+    Starts loading TinyLlama in a background thread (once per process).
+    """
+    global _prewarm_thread
+    with _prewarm_lock:
+        if _commentator is None and _prewarm_thread is None:
+            _prewarm_thread = threading.Thread(target=get_commentator, daemon=True)
+            _prewarm_thread.start()
+    return _prewarm_thread
 
+def commentary_model_loaded():
+    return _commentator is not None
+
+def describe_frame(positions):
+    """
+    Returns the situation sentences, the rule-based comment (or None) and the
+    entity nearest the ball (or None) for a frame.
+    """
     situation = []
     proximity_comment = None
-
-    # Inject frame ID if provided
-    frame_id = positions.get("frame_id", "unknown")
+    entity = None
 
     # Handle ball and proximity
     if positions.get("ball"):
         situation.append("The ball is visible on the field.")
-        entity, dist = find_ball_proximity(positions)
+        # Use proximity precomputed for the whole video when available
+        if "ball_proximity" in positions:
+            entity, dist = positions["ball_proximity"]
+        else:
+            entity, dist = find_ball_proximity(positions)
         if entity:
             entity_name = {
                 "players": "a player",
@@ -54,60 +193,102 @@ def generate_commentary(positions):
     if positions.get("players"):
         situation.append("Players are moving.")
 
-    # Use handcrafted comment if available
-    if proximity_comment:
-        commentary = proximity_comment
-    else:
-        # Prompt for generation
-        prompt = (
-            f"You are a football commentator. Frame ID: {frame_id}. "
-            "Describe ONLY what is happening in this specific frame. "
-            "Do not reference past or future events. "
-            "Avoid phrases like '10 seconds later' or 'fans are watching'. "
-            "Here is the frame description: "
-            + " ".join(situation)
-            + " Commentary:"
-        )
-
-        # Generate commentary with controlled sampling
-        generated = commentator(
-            prompt,
-            max_new_tokens=60,
-            num_return_sequences=1,
-            do_sample=True,
-            top_k=30,
-            top_p=0.85,
-            temperature=0.7,
-            repetition_penalty=2.0
-        )[0]['generated_text']
-
-        # Clean generated output
-        commentary = generated.replace(prompt, "").strip()
-
-        # Remove known repetitive or irrelevant phrases
-        bad_phrases = [
-            "10 seconds later", "in the next play", "live TV coverage",
-            "watching from home", "match has started", "started and", "again and again"
-        ]
-        for phrase in bad_phrases:
-            commentary = commentary.replace(phrase, "")
-
-        # Remove redundant or repeated sentences
-        lines = []
-        for line in commentary.split('.'):
-            line = line.strip()
-            if line and line not in lines:
-                lines.append(line)
-        commentary = '. '.join(lines).strip()
-        if commentary and not commentary.endswith('.'):
-            commentary += '.'
-
-        # Fallback if output is poor or identical to last
-        if commentary == last_commentary or not commentary or len(set(commentary.split())) < 10:
-            commentary = (
-                "Players hold their ground as action continues. "
-                "The teams are positioning themselves for the next move."
-            )
-
-    last_commentary = commentary
+    return situation, proximity_comment, entity
+
+def build_prompt(frame_id, situation):
+    return (
+        f"You are a football commentator. Frame ID: {frame_id}. "
+        "Describe ONLY what is happening in this specific frame. "
+        "Do not reference past or future events. "
+        "Avoid phrases like '10 seconds later' or 'fans are watching'. "
+        "Here is the frame description: "
+        + " ".join(situation)
+        + " Commentary:"
+    )
+
+def clean_commentary(generated, prompt):
+    # Clean generated output
+    commentary = generated.replace(prompt, "").strip()
+
+    # Remove known repetitive or irrelevant phrases
+    bad_phrases = [
+        "10 seconds later", "in the next play", "live TV coverage",
+        "watching from home", "match has started", "started and", "again and again"
+    ]
+    for phrase in bad_phrases:
+        commentary = commentary.replace(phrase, "")
+
+    # Remove redundant or repeated sentences
+    lines = []
+    for line in commentary.split('.'):
+        line = line.strip()
+        if line and line not in lines:
+            lines.append(line)
+    commentary = '. '.join(lines).strip()
+    if commentary and not commentary.endswith('.'):
+        commentary += '.'
     return commentary
+
+def _generate(prompts, batch_size):
+    # Generate commentary with controlled sampling, several prompts per forward pass
+    commentator = get_commentator()
+    with profiler.stage("commentary.generate"):
+        outputs = commentator(prompts, batch_size=batch_size, **GENERATION_KWARGS)
+    return [output[0]['generated_text'] for output in outputs]
+
+def generate_commentary_batch(positions_list, batch_size=8):
+    """
+    Commentary for several frames. Scenes with enough cached variants are
+    served from commentary_cache; the remaining prompts are run through the
+    pipeline in padded batches (one generation per missing variant). Cleanup,
+    rule-based comments and dedup then apply per item in order, exactly as
+    for generate_commentary.
+    """
+    global last_commentary
+
+    frames = []
+    pending = OrderedDict()
+    for idx, positions in enumerate(positions_list):
+        # Inject frame ID if provided
+        frame_id = positions.get("frame_id", "unknown")
+        situation, proximity_comment, entity = describe_frame(positions)
+        key = None
+        if not proximity_comment:
+            key = scene_signature(situation, entity)
+            pending.setdefault(key, []).append((idx, build_prompt(frame_id, situation)))
+        frames.append((proximity_comment, key))
+
+    # Generate only the variants each scene is still missing
+    jobs = []
+    for key, items in pending.items():
+        needed = min(len(items), commentary_cache.missing(key))
+        jobs.extend((key, prompt) for _, prompt in items[:needed])
+    if jobs:
+        outputs = _generate([prompt for _, prompt in jobs], batch_size)
+        for (key, prompt), generated in zip(jobs, outputs):
+            with profiler.stage("commentary.cleanup"):
+                commentary = clean_commentary(generated, prompt)
+            # Only cache good lines, so a scene with poor output is generated again next time
+            if usable_commentary(commentary):
+                commentary_cache.add(key, commentary)
+    llm_items = sum(len(items) for items in pending.values())
+    commentary_cache.record(hits=llm_items - len(jobs), misses=len(jobs))
+
+    commentaries = []
+    for proximity_comment, key in frames:
+        # Use handcrafted comment if available
+        if proximity_comment:
+            commentary = proximity_comment
+        else:
+            commentary = commentary_cache.take(key) or ""
+
+            # Fallback if output is poor or identical to last
+            if commentary == last_commentary or not usable_commentary(commentary):
+                commentary = FALLBACK_COMMENTARY
+
+        last_commentary = commentary
+        commentaries.append(commentary)
+    return commentaries
+
+def generate_commentary(positions):
+    return generate_commentary_batch([positions], batch_size=1)[0]
@@ -0,0 +1,159 @@
+# detection_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from detection_store import DetectionStore
+
+CACHE_DIR = Path(os.environ.get(
+    "FOOTBALL_CACHE_DIR", Path.home() / ".cache" / "ai_football_analyzer" / "detections"
+))
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+_COLUMNS = ("frame", "cls", "conf", "xywh", "offsets", "analysed")
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def _memo_key(path):
+    stat = path.stat()
+    return (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+
+def remember_file_hash(path, digest):
+    """
+    Records a SHA-256 computed elsewhere (e.g. while streaming an upload).
+    """
+    memo_key = _memo_key(Path(path))
+    with _hash_lock:
+        _hash_memo[memo_key] = digest
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    SHA-256 of a file's content, read in chunks. Memoized on (path, size, mtime)
+    so repeated reruns on an unchanged file do not re-read it.
+    """
+    path = Path(path)
+    memo_key = _memo_key(path)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _hash_lock:
+        _hash_memo[memo_key] = value
+    return value
+
+
+def cache_key(video_path, weights_path, task, conf, **extra):
+    """
+    Key for one analysis: video content, weights content, task and confidence.
+    Extra keyword arguments (e.g. sampling settings) are folded into the key.
+    """
+    parts = {
+        "video": file_hash(video_path),
+        "weights": file_hash(weights_path),
+        "task": task,
+        "conf": round(float(conf), 4),
+    }
+    parts.update(extra)
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+
+class DetectionCache:
+    """
+    Per-frame detections stored as one .npy file per column under
+    cache_dir/<key>/ and opened memory-mapped. Entries are evicted in
+    least-recently-used order once the cache grows beyond max_bytes.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        return self.cache_dir / key
+
+    def get(self, key):
+        entry = self._entry(key)
+        meta_path = entry / "meta.json"
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            columns = {name: np.load(entry / f"{name}.npy", mmap_mode="r") for name in _COLUMNS}
+            # Mark as recently used for LRU eviction; the entry may be evicted concurrently
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        names = meta.get("names")
+        return DetectionStore.from_columns(
+            columns["cls"], columns["conf"], columns["xywh"], columns["offsets"],
+            frame=columns["frame"],
+            analysed=columns["analysed"],
+            frame_size=tuple(meta["frame_size"]) if meta.get("frame_size") else None,
+            names={int(k): v for k, v in names.items()} if names else None,
+        )
+
+    def put(self, key, store):
+        entry = self._entry(key)
+        tmp = self.cache_dir / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.mkdir(parents=True, exist_ok=True)
+        try:
+            for name, column in store.columns().items():
+                np.save(tmp / f"{name}.npy", np.ascontiguousarray(column))
+            meta = {
+                "frame_size": list(store.frame_size) if store.frame_size else None,
+                "names": store.names,
+                "frames": len(store),
+                "detections": store.num_detections,
+                "created": time.time(),
+            }
+            with open(tmp / "meta.json", "w") as f:
+                json.dump(meta, f)
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                # Another writer stored the same key first
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict(keep=key)
+
+    def entries(self):
+        """
+        (key, size_bytes, last_used) for every complete cache entry.
+        """
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for entry in self.cache_dir.iterdir():
+            meta_path = entry / "meta.json"
+            if entry.name.startswith(".") or not meta_path.exists():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((entry.name, size, meta_path.stat().st_mtime))
+        return entries
+
+    def evict(self, keep=None):
+        with self._lock:
+            entries = sorted(self.entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for key, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                shutil.rmtree(self._entry(key), ignore_errors=True)
+                total -= size
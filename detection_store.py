@@ -0,0 +1,185 @@
+# detection_store.py
+
+import numpy as np
+
+
+class FrameDetections:
+    """
+    Detections of a single frame as views into a DetectionStore.
+    """
+    __slots__ = ("frame_id", "cls", "conf", "xywh")
+
+    def __init__(self, frame_id, cls, conf, xywh):
+        self.frame_id = frame_id
+        self.cls = cls
+        self.conf = conf
+        self.xywh = xywh
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class DetectionStore:
+    """
+    Columnar per-frame detections: frame index, class id, confidence and
+    xywh live in preallocated NumPy arrays, and offsets is a CSR index so
+    that frame i is the slice offsets[i]:offsets[i + 1]. Frames skipped by
+    frame sampling are kept as empty frames with analysed[i] == False, so
+    frame indices always match the source video.
+    """
+    def __init__(self, capacity=4096, frame_capacity=1024, frame_size=None, names=None):
+        self.frame = np.empty(capacity, dtype=np.int32)
+        self.cls = np.empty(capacity, dtype=np.int16)
+        self.conf = np.empty(capacity, dtype=np.float32)
+        self.xywh = np.empty((capacity, 4), dtype=np.float32)
+        self.offsets = np.zeros(frame_capacity + 1, dtype=np.int64)
+        self.analysed = np.zeros(frame_capacity, dtype=bool)
+        self.num_frames = 0
+        self.num_detections = 0
+        # (width, height) of the frames the boxes refer to
+        self.frame_size = frame_size
+        self.names = names
+
+    def _grow(self, detections, frames):
+        if detections > len(self.cls):
+            capacity = max(detections, 2 * len(self.cls))
+            self.frame = np.resize(self.frame, capacity)
+            self.cls = np.resize(self.cls, capacity)
+            self.conf = np.resize(self.conf, capacity)
+            self.xywh = np.resize(self.xywh, (capacity, 4))
+        if frames + 1 > len(self.offsets):
+            self.offsets = np.resize(self.offsets, max(frames + 1, 2 * len(self.offsets)))
+        if frames > len(self.analysed):
+            self.analysed = np.resize(self.analysed, max(frames, 2 * len(self.analysed)))
+
+    def append_frame(self, cls, conf, xywh, analysed=True):
+        n = len(cls)
+        start = self.num_detections
+        end = start + n
+        self._grow(end, self.num_frames + 1)
+        self.frame[start:end] = self.num_frames
+        self.cls[start:end] = cls
+        self.conf[start:end] = conf
+        self.xywh[start:end] = xywh
+        self.analysed[self.num_frames] = analysed
+        self.num_frames += 1
+        self.num_detections = end
+        self.offsets[self.num_frames] = end
+
+    def skip_to(self, frame_id):
+        """
+        Appends empty, not-analysed frames until the next frame is frame_id.
+        """
+        while self.num_frames < frame_id:
+            self.append_frame([], [], np.empty((0, 4), dtype=np.float32), analysed=False)
+
+    def append_result(self, result, frame_id=None):
+        """
+        Appends one ultralytics Results object, dropping the image and tensors.
+        With frame_id, any frames skipped since the last result are filled in.
+        """
+        if frame_id is not None:
+            self.skip_to(frame_id)
+        boxes = result.boxes
+        if self.frame_size is None:
+            height, width = result.orig_shape[:2]
+            self.frame_size = (width, height)
+        if self.names is None:
+            self.names = dict(result.names)
+        if boxes is None or len(boxes) == 0:
+            self.append_frame([], [], np.empty((0, 4), dtype=np.float32))
+            return
+        self.append_frame(
+            boxes.cls.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            boxes.xywh.cpu().numpy(),
+        )
+
+    def frame_slice(self, idx):
+        if idx < 0:
+            idx += self.num_frames
+        if not 0 <= idx < self.num_frames:
+            raise IndexError(f"frame {idx} out of range")
+        return slice(self.offsets[idx], self.offsets[idx + 1])
+
+    def __getitem__(self, idx):
+        s = self.frame_slice(idx)
+        return FrameDetections(idx, self.cls[s], self.conf[s], self.xywh[s])
+
+    def __len__(self):
+        return self.num_frames
+
+    def __iter__(self):
+        for idx in range(self.num_frames):
+            yield self[idx]
+
+    def columns(self):
+        """
+        Trimmed views of the detection columns.
+        """
+        n = self.num_detections
+        return {
+            "frame": self.frame[:n],
+            "cls": self.cls[:n],
+            "conf": self.conf[:n],
+            "xywh": self.xywh[:n],
+            "offsets": self.offsets[:self.num_frames + 1],
+            "analysed": self.analysed[:self.num_frames],
+        }
+
+    def save(self, path):
+        """
+        Writes the trimmed columns to a .npz file.
+        """
+        columns = self.columns()
+        frame_size = np.asarray(self.frame_size if self.frame_size else (0, 0), dtype=np.int32)
+        np.savez(path, frame_size=frame_size, **columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_columns(data["cls"], data["conf"], data["xywh"], data["offsets"],
+                                    frame=data["frame"],
+                                    analysed=data["analysed"] if "analysed" in data else None,
+                                    frame_size=tuple(int(v) for v in data["frame_size"]))
+
+    @classmethod
+    def from_columns(cls, cls_ids, conf, xywh, offsets, frame=None, analysed=None,
+                     frame_size=None, names=None):
+        store = cls(capacity=0, frame_capacity=0, frame_size=frame_size, names=names)
+        store.cls = np.asarray(cls_ids, dtype=np.int16)
+        store.conf = np.asarray(conf, dtype=np.float32)
+        store.xywh = np.asarray(xywh, dtype=np.float32).reshape(-1, 4)
+        store.offsets = np.asarray(offsets, dtype=np.int64)
+        store.num_frames = len(store.offsets) - 1
+        store.num_detections = len(store.cls)
+        if frame is None:
+            frame = np.repeat(np.arange(store.num_frames, dtype=np.int32), np.diff(store.offsets))
+        store.frame = np.asarray(frame, dtype=np.int32)
+        if analysed is None:
+            analysed = np.ones(store.num_frames, dtype=bool)
+        store.analysed = np.asarray(analysed, dtype=bool)
+        if store.frame_size == (0, 0):
+            store.frame_size = None
+        return store
+
+    def analysed_frames(self):
+        return np.flatnonzero(self.analysed[:self.num_frames])
+
+    def nearest_analysed(self, frame_ids):
+        """
+        For each frame id, the closest frame that was actually analysed.
+        """
+        analysed = self.analysed_frames()
+        frame_ids = np.asarray(frame_ids, dtype=np.int64)
+        if len(analysed) == 0:
+            return frame_ids
+        right = np.clip(np.searchsorted(analysed, frame_ids), 0, len(analysed) - 1)
+        left = np.clip(right - 1, 0, len(analysed) - 1)
+        use_left = np.abs(frame_ids - analysed[left]) <= np.abs(analysed[right] - frame_ids)
+        return np.where(use_left, analysed[left], analysed[right])
+
+    @property
+    def nbytes(self):
+        return (self.frame.nbytes + self.cls.nbytes + self.conf.nbytes
+                + self.xywh.nbytes + self.offsets.nbytes + self.analysed.nbytes)
@@ -1,9 +1,32 @@
 # position_tracker.py
 
-import math
+import numpy as np
 
-def extract_positions(results):
-    positions = {
+from detection_store import FrameDetections
+
+def _frame_arrays(results):
+    # Accepts an ultralytics Results list or one frame of a DetectionStore
+    if isinstance(results, FrameDetections):
+        return results.cls, results.xywh
+    boxes = results[0].boxes
+    return boxes.cls.cpu().numpy(), boxes.xywh.cpu().numpy()
+
+# Class ids of the detection model
+CLASS_NAMES = {
+    0: "players",
+    1: "goalkeepers",
+    2: "ball",
+    3: "main_referees",
+    4: "side_referees",
+    5: "staff_members",
+}
+BALL_CLASS = 2
+# Entities that can be close to the ball, in tie-break order
+PROXIMITY_ENTITIES = ("players", "goalkeepers", "main_referees", "side_referees")
+NUM_CLASSES = len(CLASS_NAMES)
+
+def _empty_positions():
+    return {
         "players": [],
         "goalkeepers": [],
         "main_referees": [],
@@ -12,75 +35,94 @@ def extract_positions(results):
         "ball": None
     }
 
-    for box in results[0].boxes:
-        try:
-            cls_id = int(box.cls)
-        except Exception:
-            cls_id = int(box.cls[0])  # fallback for older format
-
-        x, y = int(box.xywh[0][0]), int(box.xywh[0][1])
-
-        if cls_id == 0:  # player
-            positions["players"].append((x, y))
-        elif cls_id == 1:  # goalkeeper
-            positions["goalkeepers"].append((x, y))
-        elif cls_id == 2:  # ball
-            positions["ball"] = (x, y)
-        elif cls_id == 3:  # main referee
-            positions["main_referees"].append((x, y))
-        elif cls_id == 4:  # side referee
-            positions["side_referees"].append((x, y))
-        elif cls_id == 5:  # staff member
-            positions["staff_members"].append((x, y))
+def extract_positions(results):
+    positions = _empty_positions()
+
+    cls_ids, xywh = _frame_arrays(results)
+    cls_ids = np.asarray(cls_ids).astype(int)
+    # Box centres, truncated to whole pixels
+    xy = np.asarray(xywh)[:, :2].astype(int)
+
+    for cls_id, name in CLASS_NAMES.items():
+        if cls_id == BALL_CLASS:
+            continue
+        positions[name] = list(map(tuple, xy[cls_ids == cls_id].tolist()))
+
+    ball = np.flatnonzero(cls_ids == BALL_CLASS)
+    if len(ball):
+        positions["ball"] = tuple(xy[ball[-1]].tolist())
 
     return positions
 
+def extract_positions_batch(store, frame_ids=None):
+    """
+    extract_positions for many frames of a DetectionStore in one pass over
+    its columns. Returns one positions dict per frame in frame_ids
+    (all frames by default).
+    """
+    if frame_ids is None:
+        frame_ids = range(len(store))
+    frame_ids = np.asarray(frame_ids, dtype=np.int64)
+    columns = store.columns()
+    cls_ids = columns["cls"].astype(int)
+    xy = columns["xywh"][:, :2].astype(int)
+    offsets = columns["offsets"]
+
+    batch = [_empty_positions() for _ in frame_ids]
+    starts, ends = offsets[frame_ids], offsets[frame_ids + 1]
+    for cls_id, name in CLASS_NAMES.items():
+        idx = np.flatnonzero(cls_ids == cls_id)
+        # Detections are stored in frame order, so each frame is a contiguous run
+        lo = np.searchsorted(idx, starts)
+        hi = np.searchsorted(idx, ends)
+        class_xy = xy[idx].tolist()
+        for positions, a, b in zip(batch, lo.tolist(), hi.tolist()):
+            if a == b:
+                continue
+            if cls_id == BALL_CLASS:
+                positions["ball"] = tuple(class_xy[b - 1])
+            else:
+                positions[name] = list(map(tuple, class_xy[a:b]))
+    return batch
+
 def find_ball_proximity(positions, threshold=50):
     ball_pos = positions.get("ball")
     if not ball_pos:
         return None, None
 
-    nearest = None
-    nearest_type = None
-    min_dist = float('inf')
-
-    for entity_type in ["players", "goalkeepers", "main_referees", "side_referees"]:
-        for pos in positions.get(entity_type, []):
-            dist = math.hypot(ball_pos[0] - pos[0], ball_pos[1] - pos[1])
-            if dist < min_dist and dist < threshold:
-                min_dist = dist
-                nearest = pos
-                nearest_type = entity_type
+    types = []
+    points = []
+    for entity_type in PROXIMITY_ENTITIES:
+        entity_points = positions.get(entity_type, [])
+        points.extend(entity_points)
+        types.extend([entity_type] * len(entity_points))
+    if not points:
+        return None, None
 
-    return nearest_type, min_dist if nearest else (None, None)
+    offset = np.asarray(points, dtype=np.float64) - ball_pos
+    dist = np.hypot(offset[:, 0], offset[:, 1])
+    nearest = int(np.argmin(dist))
+    if dist[nearest] >= threshold:
+        return None, None
+    return types[nearest], float(dist[nearest])
 
 def count_detected_objects(results):
     """
     Returns a dictionary with counts for each class and ball presence.
     """
-    counts = {
-        "players": 0,
-        "goalkeepers": 0,
-        "main_referees": 0,
-        "side_referees": 0,
-        "staff_members": 0,
-        "ball": 0
-    }
-    for box in results[0].boxes:
-        try:
-            cls_id = int(box.cls)
-        except Exception:
-            cls_id = int(box.cls[0])  # fallback for older format
-        if cls_id == 0:
-            counts["players"] += 1
-        elif cls_id == 1:
-            counts["goalkeepers"] += 1
-        elif cls_id == 2:
-            counts["ball"] += 1
-        elif cls_id == 3:
-            counts["main_referees"] += 1
-        elif cls_id == 4:
-            counts["side_referees"] += 1
-        elif cls_id == 5:
-            counts["staff_members"] += 1
-    return counts
+    cls_ids, _ = _frame_arrays(results)
+    cls_ids = np.asarray(cls_ids).astype(int)
+    counts = np.bincount(cls_ids[cls_ids < NUM_CLASSES], minlength=NUM_CLASSES)
+    return {name: int(counts[cls_id]) for cls_id, name in CLASS_NAMES.items()}
+
+def count_detected_objects_batch(store):
+    """
+    Per-frame counts for a whole DetectionStore: a dictionary of class name
+    to an array with one count per frame.
+    """
+    columns = store.columns()
+    cls_ids = columns["cls"].astype(np.int64)
+    keep = cls_ids < NUM_CLASSES
+    flat = columns["frame"][keep].astype(np.int64) * NUM_CLASSES + cls_ids[keep]
+    counts = np.bincount(flat, minlength=len(store) * NUM_CLASSES).reshape(-1, NUM_CLASSES)
+    return {name: counts[:, cls_id] for cls_id, name in CLASS_NAMES.items()}
@@ -0,0 +1,93 @@
+# heatmap.py
+
+import numpy as np
+import matplotlib.pyplot as plt
+from mplsoccer import Pitch
+
+# StatsBomb pitch dimensions
+PITCH_LENGTH = 120
+PITCH_WIDTH = 80
+
+
+def _gaussian_matrix(n, sigma):
+    # Dense 1D Gaussian convolution matrix (zero padding), truncated at 3 sigma
+    idx = np.arange(n)
+    offset = idx[:, None] - idx[None, :]
+    kernel = np.exp(-0.5 * (offset / sigma) ** 2)
+    kernel[np.abs(offset) > 3 * sigma] = 0
+    return kernel / kernel[n // 2].sum()
+
+
+class PitchHeatmap:
+    """
+    Position density on a fixed grid over the StatsBomb pitch (120x80 cells
+    by default). Points are binned with np.histogram2d as they arrive, so
+    updating per frame is cheap; smoothing is a separable Gaussian applied
+    only when the heatmap is read or rendered.
+    """
+    def __init__(self, bins=(PITCH_LENGTH, PITCH_WIDTH), sigma=2.0):
+        self.bins = bins
+        self.sigma = sigma
+        self.x_edges = np.linspace(0, PITCH_LENGTH, bins[0] + 1)
+        self.y_edges = np.linspace(0, PITCH_WIDTH, bins[1] + 1)
+        self.grid = np.zeros(bins, dtype=np.float64)
+        self.points = 0
+        self._kx = _gaussian_matrix(bins[0], sigma * bins[0] / PITCH_LENGTH)
+        self._ky = _gaussian_matrix(bins[1], sigma * bins[1] / PITCH_WIDTH)
+
+    def _histogram(self, x, y):
+        counts, _, _ = np.histogram2d(x, y, bins=(self.x_edges, self.y_edges))
+        return counts
+
+    def update(self, x, y):
+        """
+        Adds pitch coordinates (arrays of x and y) to the grid.
+        """
+        if len(x):
+            self.grid += self._histogram(x, y)
+            self.points += len(x)
+
+    def remove(self, x, y):
+        """
+        Removes points added earlier, e.g. frames leaving a sliding window.
+        """
+        if len(x):
+            self.grid -= self._histogram(x, y)
+            np.maximum(self.grid, 0, out=self.grid)
+            self.points -= len(x)
+
+    def reset(self):
+        self.grid[:] = 0
+        self.points = 0
+
+    def smoothed(self):
+        # Separable Gaussian: convolve along x, then along y
+        return self._kx @ self.grid @ self._ky.T
+
+    def density(self):
+        smoothed = self.smoothed()
+        total = smoothed.sum()
+        return smoothed / total if total > 0 else smoothed
+
+    def render(self, title="Ball Position Density", cmap="Reds", figsize=(12, 8)):
+        pitch = Pitch(pitch_type='statsbomb', pitch_color='black', line_color='white', line_zorder=2)
+        fig, ax = pitch.draw(figsize=figsize)
+        density = self.density()
+        # Hide empty cells so the pitch shows through
+        masked = np.ma.masked_less_equal(density, density.max() * 0.01 if density.max() > 0 else 0)
+        ax.imshow(
+            masked.T,
+            extent=(0, PITCH_LENGTH, 0, PITCH_WIDTH),
+            origin='lower',
+            cmap=cmap,
+            alpha=0.85,
+            interpolation='bilinear',
+            aspect='auto',
+            zorder=1
+        )
+        ax.set_facecolor("black")
+        plt.title(title, fontsize=20, color='white')
+        plt.xlim(0, PITCH_LENGTH)
+        plt.ylim(0, PITCH_WIDTH)
+        plt.tight_layout()
+        return fig
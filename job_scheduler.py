@@ -0,0 +1,278 @@
+# job_scheduler.py
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from detection_cache import DetectionCache, cache_key
+from detection_store import DetectionStore
+from video_engine import VideoAnalysisEngine, FrameSampler
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Finished jobs kept for deduplication and for sessions to collect results
+MAX_FINISHED_JOBS = 64
+
+
+class AnalysisJob:
+    """
+    One detection run over a video. The DetectionStore fills while the job
+    runs, so sessions can read partial results; progress is frames read
+    divided by the frame count reported by the container.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, key, video_path, weights_path, task, conf, sampler_options):
+        self.id = next(self._ids)
+        self.key = key
+        self.video_path = str(video_path)
+        self.weights_path = str(weights_path)
+        self.task = task
+        self.conf = conf
+        self.sampler_options = dict(sampler_options or {})
+        self.sessions = []
+        self.status = QUEUED
+        self.store = DetectionStore()
+        self.frames_total = 0
+        self.frames_done = 0
+        self.error = None
+        self.cached = False
+        self.created = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    @property
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        return min(self.frames_done / self.frames_total, 1.0) if self.frames_total else 0.0
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def done(self):
+        return self._done.is_set()
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "frames_done": self.frames_done,
+            "frames_total": self.frames_total,
+            "sessions": len(self.sessions),
+            "cached": self.cached,
+            "queued_s": round((self.started or time.perf_counter()) - self.created, 3),
+            "run_s": round((self.finished or time.perf_counter()) - self.started, 3) if self.started else 0.0,
+            "error": str(self.error) if self.error else None,
+        }
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished = time.perf_counter()
+        self._done.set()
+
+
+def run_detection_job(job):
+    """
+    Default job runner: batched detection through the pipelined engine.
+    """
+    from model_registry import get_model
+    model = get_model(job.weights_path)
+
+    video_cap = cv2.VideoCapture(job.video_path)
+    job.frames_total = int(video_cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    video_cap.release()
+
+    engine = VideoAnalysisEngine(model, conf=job.conf, draw=False,
+                                 sampler=FrameSampler(**job.sampler_options))
+    for frame_idx, _, result, _ in engine.run(job.video_path):
+        job.store.append_result(result, frame_idx)
+        job.frames_done = frame_idx + 1
+    job.store.skip_to(engine.frames_total)
+    job.frames_done = job.frames_total = engine.frames_total
+
+
+class JobScheduler:
+    """
+    Local scheduler for analysis jobs. An asyncio loop on a background
+    thread dispatches queued jobs to a bounded thread pool, at most
+    max_concurrent at a time, taking turns between sessions so one
+    session's backlog cannot starve another. Jobs with identical inputs
+    are deduplicated, and results found in the detection cache complete
+    without running.
+    """
+    def __init__(self, max_concurrent=2, runner=run_detection_job, cache=None):
+        self.max_concurrent = max_concurrent
+        self.runner = runner
+        self.cache = cache
+        self.jobs = {}
+        self.completed = 0
+        self.frames_completed = 0
+        self._queues = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="analysis-job")
+        self._loop = asyncio.new_event_loop()
+        self._tasks = set()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        self._wakeup = asyncio.run_coroutine_threadsafe(self._make_event(), self._loop).result()
+        self._dispatcher = asyncio.run_coroutine_threadsafe(self._dispatch(), self._loop)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _make_event(self):
+        return asyncio.Event()
+
+    def job_key(self, video_path, weights_path, task, conf, sampler_options=None):
+        sampling = FrameSampler(**(sampler_options or {})).key()
+        return cache_key(video_path, weights_path, task, conf, sampling=sampling)
+
+    def submit(self, session_id, video_path, weights_path, task, conf, sampler_options=None):
+        """
+        Queues a job for a session, or returns the existing job with the
+        same inputs. Safe to call from any thread.
+        """
+        key = self.job_key(video_path, weights_path, task, conf, sampler_options)
+        with self._lock:
+            job = self.jobs.get(key)
+            if job is not None and job.status != FAILED:
+                if session_id not in job.sessions:
+                    job.sessions.append(session_id)
+                return job
+
+            job = AnalysisJob(key, video_path, weights_path, task, conf, sampler_options)
+            job.sessions.append(session_id)
+            self.jobs.pop(key, None)
+            self.jobs[key] = job
+            self._prune()
+
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                job.store = cached
+                job.frames_done = job.frames_total = len(cached)
+                job.cached = True
+                job.started = job.created
+                job._finish(DONE)
+                return job
+
+            self._queues.setdefault(session_id, deque()).append(job)
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job
+
+    def _prune(self):
+        finished = [key for key, job in self.jobs.items() if job.done()]
+        for key in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[key]
+
+    def _next_job(self):
+        # Round-robin over sessions: take one job, then move the session to the back
+        with self._lock:
+            for session_id in list(self._queues):
+                queue = self._queues.pop(session_id)
+                job = queue.popleft()
+                if queue:
+                    self._queues[session_id] = queue
+                return job
+        return None
+
+    async def _dispatch(self):
+        slots = asyncio.Semaphore(self.max_concurrent)
+        while True:
+            # Pick the next job only once a slot is free, so fairness reflects
+            # the queues at that moment
+            await slots.acquire()
+            job = self._next_job()
+            while job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                job = self._next_job()
+            task = self._loop.create_task(self._run(job, slots))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job, slots):
+        job.status = RUNNING
+        job.started = time.perf_counter()
+        try:
+            await self._loop.run_in_executor(self._executor, self.runner, job)
+            if self.cache is not None:
+                await self._loop.run_in_executor(self._executor, self.cache.put, job.key, job.store)
+            with self._lock:
+                self.completed += 1
+                self.frames_completed += job.frames_done
+            job._finish(DONE)
+        except asyncio.CancelledError:
+            job._finish(FAILED, RuntimeError("Scheduler shut down"))
+            raise
+        except Exception as e:
+            job._finish(FAILED, e)
+        finally:
+            slots.release()
+
+    async def _cancel_tasks(self):
+        tasks = [*self._tasks, asyncio.wrap_future(self._dispatcher)]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+            elapsed = time.perf_counter() - self._started
+            return {
+                "queued": statuses.count(QUEUED),
+                "running": statuses.count(RUNNING),
+                "done": statuses.count(DONE),
+                "failed": statuses.count(FAILED),
+                "max_concurrent": self.max_concurrent,
+                "jobs_per_min": round(self.completed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+                "frames_per_s": round(self.frames_completed / elapsed, 1) if elapsed > 0 else 0.0,
+            }
+
+    def shutdown(self):
+        """
+        Cancels the dispatcher and running jobs, fails queued jobs, then
+        stops the loop and joins its thread. Runner calls already on the
+        thread pool finish in the background.
+        """
+        if self._loop.is_closed():
+            return
+        with self._lock:
+            queued = [job for queue in self._queues.values() for job in queue]
+            self._queues.clear()
+        for job in queued:
+            job._finish(FAILED, RuntimeError("Scheduler shut down"))
+        asyncio.run_coroutine_threadsafe(self._cancel_tasks(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(max_concurrent=2):
+    """
+    Process-wide scheduler shared by all Streamlit sessions.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler(max_concurrent=max_concurrent, cache=DetectionCache())
+        return _scheduler
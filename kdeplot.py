@@ -1,66 +1,96 @@
 # kdeplot.py
 
-import cv2
-from ultralytics import YOLO
+from pathlib import Path
+
 import numpy as np
 import matplotlib.pyplot as plt
 from mplsoccer import Pitch
 import seaborn as sns
 
-def generate_kde_plot(video_path, weights_path):
-    # Load model
-    model = YOLO(weights_path)
-
-    # Open video
-    cap = cv2.VideoCapture(video_path)
-    ret, frame = cap.read()
-    if not ret:
-        print("Could not read video.")
-        return None
-    height, width, _ = frame.shape
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+from detection_store import DetectionStore
+from extract_positions import BALL_CLASS
+from video_engine import VideoAnalysisEngine, FRAME_SIZE
+from heatmap import PitchHeatmap
+from pitch_calibration import PitchCalibration
+from profiling import profiler
 
-    x_coords, y_coords = [], []
+def detect_video_positions(video_path, model, conf=0.25, frame_size=FRAME_SIZE, sampler=None):
+    """
+    Runs detection over the whole video once and returns a DetectionStore.
+    model can be a loaded model or a weights path; sampler is an optional
+    FrameSampler choosing which frames to analyse.
+    """
+    if isinstance(model, (str, Path)):
+        # Imported here so plotting precomputed detections does not need ultralytics
+        from model_registry import get_model
+        model = get_model(model)
+    engine = VideoAnalysisEngine(model, conf=conf, frame_size=frame_size, draw=False, sampler=sampler)
+    store = DetectionStore()
+    for frame_idx, _, result, _ in engine.run(video_path):
+        store.append_result(result, frame_idx)
+    store.skip_to(engine.frames_total)
+    return store
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+# The density plots show where the ball was
+KDE_CLASS_ID = BALL_CLASS
 
-        results = model(frame)
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        class_ids = results[0].boxes.cls.cpu().numpy().astype(int)
+def pitch_coordinates(detections, class_id=KDE_CLASS_ID, calibration=None):
+    """
+    Box centres of one class mapped from frame pixels to the StatsBomb pitch.
+    Without a PitchCalibration the frame is stretched over the whole pitch.
+    """
+    if calibration is None:
+        calibration = PitchCalibration.default(detections.frame_size)
+    calibration = calibration.for_frame_size(detections.frame_size)
+    columns = detections.columns()
+    centres = columns["xywh"][columns["cls"] == class_id, :2]
+    pitch_xy = calibration.to_statsbomb(centres)
+    return pitch_xy[:, 0], pitch_xy[:, 1]
 
-        for box, class_id in zip(boxes, class_ids):
-            if class_id == 2:  # Assuming class 2 is 'player'
-                x1, y1, x2, y2 = box
-                x_center = (x1 + x2) / 2
-                y_center = (y1 + y2) / 2
-
-                x_pitch = (x_center / width) * 120
-                y_pitch = (y_center / height) * 80
+def generate_kde_plot(video_path, weights_path, detections=None, conf=0.25, backend="histogram",
+                      calibration=None):
+    """
+    Position density over the pitch. The default "histogram" backend bins
+    points into a PitchHeatmap grid; backend="kde" uses seaborn.kdeplot on
+    the raw points, which is much slower on long matches. Pass a
+    PitchCalibration to place points by the video's pitch homography.
+    """
+    # Reuse detections from an earlier run (a DetectionStore or a saved .npz file)
+    # instead of running the model over the video again
+    if isinstance(detections, (str, Path)):
+        detections = DetectionStore.load(detections)
+    if detections is None:
+        detections = detect_video_positions(video_path, weights_path, conf)
+    if len(detections) == 0 or not detections.frame_size:
+        print("Could not read video.")
+        return None
 
-                x_coords.append(x_pitch)
-                y_coords.append(y_pitch)
+    x_coords, y_coords = pitch_coordinates(detections, calibration=calibration)
 
-    cap.release()
+    if backend == "histogram":
+        heatmap = PitchHeatmap()
+        with profiler.stage("kde.bin"):
+            heatmap.update(x_coords, y_coords)
+        with profiler.stage("kde.render"):
+            return heatmap.render(title="Ball Position Density")
 
     pitch = Pitch(pitch_type='statsbomb', pitch_color='black', line_color='white')
     fig, ax = pitch.draw(figsize=(12, 8))
 
-    sns.kdeplot(
-        x=x_coords,
-        y=y_coords,
-        levels=15,
-        fill=False,
-        cmap="Reds",
-        linewidths=1.5,
-        ax=ax,
-        thresh=0.01
-    )
+    with profiler.stage("kde.seaborn"):
+        sns.kdeplot(
+            x=x_coords,
+            y=y_coords,
+            levels=15,
+            fill=False,
+            cmap="Reds",
+            linewidths=1.5,
+            ax=ax,
+            thresh=0.01
+        )
 
     ax.set_facecolor("black")
-    plt.title("Player Position Density (KDE)", fontsize=20, color='white')
+    plt.title("Ball Position Density (KDE)", fontsize=20, color='white')
     plt.xlim(0, 120)
     plt.ylim(0, 80)
     plt.tight_layout()
@@ -0,0 +1,265 @@
+# live_stream.py
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from detection_store import FrameDetections
+from extract_positions import extract_positions, CLASS_NAMES, NUM_CLASSES
+from heatmap import PitchHeatmap
+from kdeplot import KDE_CLASS_ID
+from pitch_calibration import PitchCalibration
+from profiling import profiler
+from video_engine import FRAME_SIZE
+
+# Assumed frame rate of live sources that do not report one
+DEFAULT_FPS = 25.0
+
+
+def parse_source(source):
+    """
+    OpenCV source from user input: a webcam index ("0"), a stream URL
+    (rtsp://, http://, ...) or a file path.
+    """
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+def is_live_source(source):
+    source = parse_source(source)
+    return isinstance(source, int) or "://" in source
+
+
+class LatestFrameReader:
+    """
+    Reads a source on a background thread and keeps only the newest frame,
+    so a slow consumer always gets the most recent picture instead of a
+    growing backlog. File sources can be replayed at their native frame
+    rate (realtime=True) to stand in for a live feed.
+    """
+    def __init__(self, source, frame_size=FRAME_SIZE, realtime=True):
+        self.source = parse_source(source)
+        self.frame_size = frame_size
+        self.realtime = realtime and not is_live_source(source)
+        self.fps = DEFAULT_FPS
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.ended = False
+        self.error = None
+        self._latest = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        video_cap = cv2.VideoCapture(self.source)
+        if not video_cap.isOpened():
+            video_cap.release()
+            raise IOError(f"Could not open source: {self.source}")
+        self.fps = video_cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        self._thread = threading.Thread(target=self._read, args=(video_cap,), daemon=True)
+        self._thread.start()
+        return self
+
+    def _read(self, video_cap):
+        start = time.perf_counter()
+        frame_idx = 0
+        try:
+            while not self._stop.is_set():
+                if self.realtime:
+                    # Sleep until this frame is due on the source's clock
+                    delay = start + frame_idx / self.fps - time.perf_counter()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                success, image = video_cap.read()
+                if not success:
+                    break
+                captured = time.perf_counter()
+                if self.frame_size:
+                    image = cv2.resize(image, self.frame_size)
+                with self._cond:
+                    if self._latest is not None:
+                        self.frames_dropped += 1
+                    self._latest = (frame_idx, captured, image)
+                    self.frames_read += 1
+                    self._cond.notify()
+                frame_idx += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            video_cap.release()
+            with self._cond:
+                self.ended = True
+                self._cond.notify()
+
+    def read(self, timeout=1.0):
+        """
+        Newest unread (frame_idx, captured_at, image), or None once the
+        source has ended or nothing arrived within timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._latest is not None or self.ended, timeout)
+            item, self._latest = self._latest, None
+            return item
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class RollingWindow:
+    """
+    Detections of the last `size` analysed frames. Object counts and the
+    pitch heatmap are updated as frames enter and leave the window, so the
+    cost per frame and the memory held do not grow with match length.
+    """
+    def __init__(self, size=300, frame_size=FRAME_SIZE, heatmap_class=KDE_CLASS_ID, calibration=None):
+        self.size = size
+        self.frame_size = frame_size
+        self.heatmap_class = heatmap_class
+        if calibration is None:
+            calibration = PitchCalibration.default(frame_size)
+        self.calibration = calibration.for_frame_size(frame_size)
+        self.frames = deque()
+        self.class_totals = np.zeros(NUM_CLASSES, dtype=np.int64)
+        self.heatmap = PitchHeatmap()
+
+    def _pitch_xy(self, cls, xywh):
+        pitch_xy = self.calibration.to_statsbomb(xywh[cls == self.heatmap_class, :2])
+        return pitch_xy[:, 0], pitch_xy[:, 1]
+
+    def push(self, frame):
+        """
+        Adds a FrameDetections and evicts the oldest frame if the window is full.
+        """
+        cls = frame.cls.astype(np.int64)
+        self.frames.append(frame)
+        self.class_totals += np.bincount(cls, minlength=NUM_CLASSES)[:NUM_CLASSES]
+        self.heatmap.update(*self._pitch_xy(cls, frame.xywh))
+        if len(self.frames) > self.size:
+            old = self.frames.popleft()
+            old_cls = old.cls.astype(np.int64)
+            self.class_totals -= np.bincount(old_cls, minlength=NUM_CLASSES)[:NUM_CLASSES]
+            self.heatmap.remove(*self._pitch_xy(old_cls, old.xywh))
+
+    @property
+    def latest(self):
+        return self.frames[-1] if self.frames else None
+
+    def counts(self):
+        """
+        Objects in the newest frame, and the average per frame over the window.
+        """
+        latest = self.latest
+        current = np.bincount(latest.cls.astype(np.int64), minlength=NUM_CLASSES) if latest is not None \
+            else np.zeros(NUM_CLASSES, dtype=np.int64)
+        average = self.class_totals / max(len(self.frames), 1)
+        return {
+            name: {"current": int(current[cls_id]), "window_avg": round(float(average[cls_id]), 2)}
+            for cls_id, name in CLASS_NAMES.items()
+        }
+
+
+class LiveAnalyzer:
+    """
+    Rolling analysis of a live source. Each iteration of run() analyses the
+    newest frame; frames that arrive while the model is busy are dropped
+    rather than queued. Work that can wait (drawing the preview) is skipped
+    for frames already over latency_budget_ms, and commentary is generated
+    on a background thread every commentary_every_s seconds.
+    """
+    def __init__(self, model, conf=0.4, window=300, frame_size=FRAME_SIZE, latency_budget_ms=200,
+                 realtime=True, preview=None, commentary_fn=None, commentary_every_s=10.0,
+                 calibration=None):
+        self.model = model
+        self.conf = conf
+        self.frame_size = frame_size
+        self.latency_budget = latency_budget_ms / 1000
+        self.realtime = realtime
+        self.preview = preview
+        self.commentary_fn = commentary_fn
+        self.commentary_every = commentary_every_s
+        self.window = RollingWindow(window, frame_size, calibration=calibration)
+        self.latencies = deque(maxlen=500)
+        self.frames_analysed = 0
+        self.over_budget = 0
+        self.reader = None
+
+    def run(self, source):
+        """
+        Yields one update per analysed frame: a dict with frame_idx,
+        latency_ms, over_budget, counts, preview (JPEG bytes or None) and
+        commentary (the result of commentary_fn when a new one is ready).
+        """
+        self.reader = LatestFrameReader(source, self.frame_size, self.realtime).start()
+        commentary_pool = ThreadPoolExecutor(max_workers=1) if self.commentary_fn else None
+        pending = None
+        last_commentary = None
+        try:
+            while True:
+                item = self.reader.read()
+                if item is None:
+                    if self.reader.ended:
+                        break
+                    continue
+                frame_idx, captured, image = item
+
+                with profiler.stage("live.predict"):
+                    result = self.model.predict(image, conf=self.conf, verbose=False)[0]
+                boxes = result.boxes
+                frame = FrameDetections(frame_idx, boxes.cls.cpu().numpy(),
+                                        boxes.conf.cpu().numpy(), boxes.xywh.cpu().numpy())
+                with profiler.stage("live.window"):
+                    self.window.push(frame)
+
+                over_budget = time.perf_counter() - captured > self.latency_budget
+                plotted = None
+                if self.preview is not None and not over_budget and self.preview.due():
+                    with profiler.stage("live.preview"):
+                        plotted = self.preview.encode(result.plot())
+
+                commentary = None
+                if pending is not None and pending.done():
+                    commentary, pending = pending.result(), None
+                if commentary_pool is not None and pending is None and \
+                        (last_commentary is None or captured - last_commentary >= self.commentary_every):
+                    last_commentary = captured
+                    pending = commentary_pool.submit(self.commentary_fn, extract_positions(frame))
+
+                latency = time.perf_counter() - captured
+                self.latencies.append(latency)
+                self.frames_analysed += 1
+                self.over_budget += latency > self.latency_budget
+                yield {
+                    "frame_idx": frame_idx,
+                    "latency_ms": round(latency * 1000, 1),
+                    "over_budget": latency > self.latency_budget,
+                    "counts": self.window.counts(),
+                    "preview": plotted,
+                    "commentary": commentary,
+                }
+            if self.reader.error is not None:
+                raise self.reader.error
+        finally:
+            self.reader.stop()
+            if commentary_pool is not None:
+                commentary_pool.shutdown(wait=False, cancel_futures=True)
+
+    def report(self):
+        latencies = np.asarray(self.latencies) * 1000
+        reader = self.reader
+        return {
+            "frames_read": reader.frames_read if reader else 0,
+            "frames_analysed": self.frames_analysed,
+            "frames_dropped": reader.frames_dropped if reader else 0,
+            "over_budget": self.over_budget,
+            "latency_budget_ms": round(self.latency_budget * 1000, 1),
+            "latency_p50_ms": round(float(np.percentile(latencies, 50)), 1) if len(latencies) else 0.0,
+            "latency_p95_ms": round(float(np.percentile(latencies, 95)), 1) if len(latencies) else 0.0,
+            "window_frames": len(self.window.frames),
+        }
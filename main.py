@@ -1,14 +1,37 @@
 #Import All the Required Libraries
+import time
+import io
+import uuid
+import zipfile
+_startup_start = time.perf_counter()
 import cv2
+import numpy as np
+import pandas as pd
 import streamlit as st
+import matplotlib.pyplot as plt
 from pathlib import Path
 import sys
-from ultralytics import YOLO 
 from PIL import Image
-from kdeplot import generate_kde_plot  
-from extract_positions import extract_positions, count_detected_objects
-from commentary_generator import generate_commentary
-from text_to_audio import generate_audio
+from kdeplot import generate_kde_plot, detect_video_positions
+from extract_positions import extract_positions, extract_positions_batch, count_detected_objects, CLASS_NAMES
+from commentary_generator import generate_commentary, generate_commentary_batch, prewarm_commentary, commentary_model_loaded, commentary_cache
+from text_to_audio import generate_audio, generate_audio_batch
+from video_engine import VideoAnalysisEngine, FrameSampler, FRAME_SIZE
+from detection_store import DetectionStore
+from detection_cache import DetectionCache, cache_key
+from model_registry import get_model, load_report
+from proximity import compute_proximity, possession_timeline, PROXIMITY_THRESHOLD_M
+from tracker import track_store
+from profiling import profiler
+from preview import PreviewThrottle
+from upload_store import save_upload
+from job_scheduler import get_scheduler, FAILED
+from live_stream import LiveAnalyzer
+from pitch_calibration import PitchCalibration, PITCH_KEYPOINTS, load_calibration, save_calibration
+from match_export import export_match, load_match, read_metadata, FORMATS
+
+#Startup timing report (the TinyLlama commentary model is not loaded at import)
+startup_timings = {"imports_s": time.perf_counter() - _startup_start}
 
 
 #Get the absolute path of the current file
@@ -27,8 +50,10 @@ ROOT = ROOT.relative_to(Path.cwd())
 #Sources
 IMAGE = 'Image'
 VIDEO = 'Video'
+LIVE = 'Live Stream'
+SAVED = 'Saved Analysis'
 
-SOURCES_LIST = [IMAGE, VIDEO]
+SOURCES_LIST = [IMAGE, VIDEO, LIVE, SAVED]
 
 #Image Config
 IMAGES_DIR = ROOT/'images'
@@ -46,6 +71,9 @@ VIDEOS_DICT = {
 MODEL_DIR = ROOT/'weights'
 DETECTION_MODEL = MODEL_DIR/'best.pt'
 
+#Exported match analyses (Parquet / Arrow)
+EXPORT_DIR = ROOT/'exports'
+
 #In case of your custom model
 #DETECTION_MODEL = MODEL_DIR/'custom_model_weight.pt'
 
@@ -53,6 +81,9 @@ SEGMENTATION_MODEL  = MODEL_DIR/'yolo11n-seg.pt'
 
 POSE_ESTIMATION_MODEL = MODEL_DIR/'yolo11n-pose.pt'
 
+#Optional pitch keypoint model for automatic calibration
+PITCH_KEYPOINT_MODEL = MODEL_DIR/'pitch_keypoints.pt'
+
 #Page Layout
 st.set_page_config(
     page_title = "lets analyze football matches",
@@ -74,6 +105,35 @@ model_type = st.sidebar.radio("Task", ["Detection", "Segmentation", "Pose Estima
 #Select Confidence Value
 confidence_value = float(st.sidebar.slider("Select Model Confidence Value", 25, 100, 40))/100
 
+#Number of video frames sent to the model per predict call
+batch_size = st.sidebar.slider("Inference Batch Size", 1, 32, 8)
+
+#Live preview rate; analysis itself runs at full speed
+preview_fps = st.sidebar.slider("Preview FPS", 1, 30, 5)
+preview_quality = st.sidebar.slider("Preview JPEG Quality", 30, 95, 75)
+
+#Which video frames are analysed
+ANALYSIS_MODES = {
+    "Every Frame": "all",
+    "Fixed Stride": "stride",
+    "Target FPS": "target_fps",
+    "Motion-Adaptive": "motion",
+}
+analysis_mode = ANALYSIS_MODES[st.sidebar.selectbox("Video Analysis Mode", list(ANALYSIS_MODES))]
+sampler_options = {}
+if analysis_mode == "stride":
+    sampler_options["stride"] = st.sidebar.slider("Analyse Every N-th Frame", 2, 30, 5)
+elif analysis_mode == "target_fps":
+    sampler_options["target_fps"] = float(st.sidebar.slider("Analysed Frames per Second", 1, 30, 5))
+elif analysis_mode == "motion":
+    sampler_options["motion_threshold"] = float(st.sidebar.slider("Motion Threshold", 1, 50, 6))
+
+def make_sampler():
+    return FrameSampler(analysis_mode, **sampler_options)
+
+#Ball proximity distance for videos with a pitch calibration
+proximity_threshold_m = st.sidebar.slider("Ball Proximity (m, calibrated videos)", 0.5, 5.0, PROXIMITY_THRESHOLD_M, 0.5)
+
 #Selecting Detection, Segmentation, Pose Estimation Model
 if model_type == 'Detection':
     model_path = Path(DETECTION_MODEL)
@@ -82,13 +142,376 @@ elif model_type == 'Segmentation':
 elif model_type ==  'Pose Estimation':
     model_path = Path(POSE_ESTIMATION_MODEL)
 
-#Load the YOLO Model
+#Load the YOLO Model (once per process, shared across sessions and reruns)
 try:
-    model = YOLO(model_path)
+    model_start = time.perf_counter()
+    model = get_model(model_path)
+    startup_timings["detection_model_s"] = time.perf_counter() - model_start
+    with st.sidebar.expander("Model Load Times (s)"):
+        st.json(load_report())
 except Exception as e:
     st.error(f"Unable to load model. Check the sepcified path: {model_path}")
     st.error(e)
 
+#Optionally load the commentary model in the background while detection runs
+if st.sidebar.checkbox("Pre-load Commentary Model", value=False):
+    prewarm_commentary()
+
+startup_timings["ready_s"] = time.perf_counter() - _startup_start
+with st.sidebar.expander("Startup Timing (s)"):
+    st.json({name: round(value, 3) for name, value in startup_timings.items()})
+    st.write(f"Commentary model loaded: {'Yes' if commentary_model_loaded() else 'No'}")
+
+#Per-stage timing (process-wide, near-zero cost while disabled)
+#One profiler serves every session, so this is an explicit global switch rather than a per-session checkbox
+st.sidebar.caption(f"Profiling is {'on' if profiler.enabled else 'off'} for all sessions.")
+# Each button sets the state it names, so a stale label in another session cannot undo it
+if profiler.enabled:
+    if st.sidebar.button("Stop Profiling"):
+        profiler.enabled = False
+        st.rerun()
+elif st.sidebar.button("Start Profiling"):
+    profiler.enabled = True
+    st.rerun()
+if profiler.enabled:
+    with st.sidebar.expander("Stage Timings (ms)"):
+        st.dataframe(profiler.stats())
+        st.download_button("Download Trace (Chrome JSON)", profiler.trace_json(),
+                           file_name="football_trace.json", mime="application/json")
+        if st.button("Reset Timings"):
+            profiler.reset()
+
+#On-disk detection cache shared by all sessions
+detection_cache = DetectionCache()
+
+#Background jobs share a bounded pool across sessions instead of running in this script
+JOB_SLOTS = 2
+use_job_queue = st.sidebar.checkbox("Run Detection as Background Job", value=False)
+if use_job_queue:
+    scheduler = get_scheduler(JOB_SLOTS)
+    with st.sidebar.expander("Job Queue"):
+        st.json(scheduler.stats())
+
+def session_id():
+    return st.session_state.setdefault('session_id', uuid.uuid4().hex)
+
+def detection_key(video_path):
+    return cache_key(video_path, model_path, model_type, confidence_value,
+                     sampling=make_sampler().key())
+
+def get_detections(video_path, results_key):
+    # Run inference at most once per (video, model, task, confidence)
+    key = detection_key(video_path)
+    if st.session_state.get(results_key + '_key') != key:
+        store = detection_cache.get(key)
+        if store is None:
+            store = detect_video_positions(video_path, model, confidence_value, sampler=make_sampler())
+            detection_cache.put(key, store)
+        st.session_state[results_key] = store
+        st.session_state[results_key + '_key'] = key
+    return st.session_state[results_key]
+
+def detect_video_job(video_path, results_key):
+    # Queue the run and poll it; identical runs from other sessions are shared
+    job = scheduler.submit(session_id(), video_path, model_path, model_type, confidence_value,
+                           {"mode": analysis_mode, **sampler_options})
+    progress = st.progress(0.0, text="Queued...")
+    while not job.wait(0.5):
+        snapshot = job.snapshot()
+        progress.progress(snapshot["progress"],
+                          text=f"{snapshot['status'].capitalize()}: {snapshot['frames_done']} frames, "
+                               f"{job.store.num_detections} detections so far")
+    progress.progress(1.0, text="Done")
+    if job.status == FAILED:
+        raise job.error
+    st.session_state[results_key] = job.store
+    st.session_state[results_key + '_key'] = job.key
+    st.info(f"Detections for {len(job.store)} frames ready"
+            + (" (from cache)." if job.cached else "."))
+    with st.sidebar.expander("Job Timing (s)"):
+        st.json(job.snapshot())
+
+def detect_video(video_path, results_key):
+    if use_job_queue:
+        return detect_video_job(video_path, results_key)
+    key = detection_key(video_path)
+    cached = detection_cache.get(key)
+    if cached is not None:
+        st.session_state[results_key] = cached
+        st.session_state[results_key + '_key'] = key
+        st.info(f"Loaded detections for {len(cached)} frames from cache.")
+        return
+
+    # Decode, inference and drawing run on separate threads; this loop only displays frames
+    engine = VideoAnalysisEngine(model, conf=confidence_value, batch_size=batch_size,
+                                 sampler=make_sampler(),
+                                 preview=PreviewThrottle(preview_fps, preview_quality))
+    st_frame = st.empty()
+    # Keep only compact per-frame detections, not the Results objects and their images
+    store = DetectionStore()
+    st.session_state[results_key] = store
+    st.session_state.pop(results_key + '_key', None)
+    for frame_idx, image, result, result_plotted in engine.run(video_path):
+        # Only frames picked by the preview throttle arrive drawn (as JPEG)
+        if result_plotted is not None:
+            with profiler.stage("ui.image"):
+                st_frame.image(result_plotted, caption="Detected Video",
+                               use_container_width=True)
+        store.append_result(result, frame_idx)
+    store.skip_to(engine.frames_total)
+    st.session_state[results_key + '_key'] = key
+    detection_cache.put(key, store)
+    with st.sidebar.expander("Pipeline Throughput (fps)"):
+        st.json(engine.report())
+        st.caption(f"{store.num_detections} detections in {len(store)} frames, {store.nbytes / 1e6:.2f} MB")
+
+#Commentary Config
+COMMENTARY_EVERY = 30
+COMMENTARY_BATCH_SIZE = 8
+
+def video_proximity(results, calibration=None):
+    # Metres on calibrated videos, pixels otherwise
+    if calibration is None:
+        return compute_proximity(results)
+    return compute_proximity(results, proximity_threshold_m, calibration=calibration)
+
+def video_commentary(results, skip_first=False, calibration=None):
+    # Comment on every COMMENTARY_EVERY-th frame, generating all lines in batches
+    # Returns the lines as [{"frame_id", "commentary"}] for export
+    frame_ids = [idx for idx in range(0, len(results), COMMENTARY_EVERY)
+                 if not (skip_first and idx == 0)]
+    # With frame sampling, comment on the closest frame that was analysed
+    frame_ids = list(dict.fromkeys(results.nearest_analysed(frame_ids).tolist()))
+    positions_list = extract_positions_batch(results, frame_ids)
+    proximity = video_proximity(results, calibration)
+    for idx, positions in zip(frame_ids, positions_list):
+        positions["frame_id"] = idx
+        positions["ball_proximity"] = proximity.entity(idx)
+    with st.expander("Ball Possession"):
+        possession = possession_timeline(proximity)
+        for cls_id, frames in possession["frames_in_possession"].items():
+            st.write(f"{CLASS_NAMES[cls_id]}: {frames} frames")
+        st.write(f"Possession changes: {possession['possession_changes']}")
+    with st.spinner("Generating commentary..."):
+        commentaries = generate_commentary_batch(positions_list, batch_size=COMMENTARY_BATCH_SIZE)
+    with st.sidebar.expander("Commentary Cache"):
+        st.json(commentary_cache.stats())
+    with st.spinner("Generating audio..."):
+        audio_files = generate_audio_batch(commentaries)
+    for idx, commentary, audio_file in zip(frame_ids, commentaries, audio_files):
+        st.write(f"AI Commentary (frame {idx}):")
+        st.write(commentary)
+        st.audio(audio_file, format='audio/wav')
+    return [{"frame_id": idx, "commentary": commentary} for idx, commentary in zip(frame_ids, commentaries)]
+
+def video_fps(video_path):
+    video_cap = cv2.VideoCapture(str(video_path))
+    fps = video_cap.get(cv2.CAP_PROP_FPS)
+    video_cap.release()
+    return fps or None
+
+def show_tracks(video_path, results, calibration=None):
+    # Per-player trajectories from the stored detections
+    tracks, tracker = track_store(results, fps=video_fps(video_path), calibration=calibration)
+    st.markdown(f"**Tracks:** {len(tracks)}")
+    st.caption("Distance in metres, speed in m/s." if calibration is not None
+               else "Distance in pixels, speed in pixels/s. Calibrate the pitch for metres.")
+    st.dataframe(tracks.summary())
+    with st.expander("Association Cost per Frame"):
+        st.json(tracker.timing())
+
+    # Who has the ball: the track of the entity nearest the ball in each frame
+    proximity = video_proximity(results, calibration)
+    # Index row_track only where there is a nearest entity (it is empty on clips without detections)
+    owner = np.full(len(proximity), -1, dtype=np.int64)
+    has_owner = proximity.nearest_row >= 0
+    owner[has_owner] = tracks.row_track[proximity.nearest_row[has_owner]]
+    possession = possession_timeline(proximity, owner=owner, fps=tracks.fps)
+    with st.expander("Ball Possession by Track"):
+        ranked = sorted(possession["frames_in_possession"].items(), key=lambda item: -item[1])
+        for track_id, frames in ranked[:10]:
+            st.write(f"Track {track_id}: {frames} frames")
+        st.write(f"Possession changes: {possession['possession_changes']}")
+
+#Live Stream Config
+LIVE_HEATMAP_EVERY_S = 3.0
+
+def live_commentary(positions):
+    # Runs on the analyzer's commentary thread, off the per-frame path
+    commentary = generate_commentary(positions)
+    return commentary, generate_audio(commentary)
+
+def live_stream(source, window, latency_budget_ms, realtime, commentary_every_s):
+    analyzer = LiveAnalyzer(model, conf=confidence_value, window=window,
+                            latency_budget_ms=latency_budget_ms, realtime=realtime,
+                            preview=PreviewThrottle(preview_fps, preview_quality),
+                            commentary_fn=live_commentary if commentary_every_s else None,
+                            commentary_every_s=commentary_every_s or 0,
+                            # Saved calibration of a replayed file; live feeds use the default mapping
+                            calibration=load_calibration(source) if Path(source).is_file() else None)
+    st_frame = st.empty()
+    st_status = st.empty()
+    col1, col2 = st.columns(2)
+    st_counts = col1.empty()
+    st_heatmap = col2.empty()
+    st_commentary = st.container()
+    last_heatmap = 0.0
+    # Runs until the source ends or the user presses Stop (which reruns the script)
+    for update in analyzer.run(source):
+        if update["preview"] is not None:
+            st_frame.image(update["preview"], caption="Live Detection", use_container_width=True)
+        st_status.caption(f"Frame {update['frame_idx']}: {update['latency_ms']} ms"
+                          + (" (over budget)" if update["over_budget"] else ""))
+        st_counts.table(update["counts"])
+        if time.perf_counter() - last_heatmap >= LIVE_HEATMAP_EVERY_S:
+            last_heatmap = time.perf_counter()
+            fig = analyzer.window.heatmap.render(title="Rolling Ball Density")
+            st_heatmap.pyplot(fig)
+            plt.close(fig)
+        if update["commentary"] is not None:
+            commentary, audio_file = update["commentary"]
+            with st_commentary:
+                st.write(f"AI Commentary (frame {update['frame_idx']}):")
+                st.write(commentary)
+                st.audio(audio_file, format='audio/wav')
+    with st.sidebar.expander("Live Latency"):
+        st.json(analyzer.report())
+
+def export_video(video_path, results_key, name, calibration=None, format="parquet"):
+    # Detections, counts, proximity and any generated commentary, as a folder and a zip download
+    detections = get_detections(video_path, results_key)
+    key = st.session_state[results_key + '_key']
+    # Commentary is only exported if it was generated from these detections
+    commentary_key, commentary = st.session_state.get(results_key + '_commentary', (None, None))
+    if commentary_key != key:
+        commentary = None
+    path = export_match(EXPORT_DIR / f"{Path(name).stem}-{key[:8]}", detections,
+                        fps=video_fps(video_path),
+                        commentary=commentary,
+                        calibration=calibration, format=format,
+                        video=name, model=model_path.name, task=model_type, conf=confidence_value)
+    buffer = io.BytesIO()
+    # Parquet is already compressed; store the files as they are
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for file in sorted(path.iterdir()):
+            archive.write(file, f"{path.name}/{file.name}")
+    st.success(f"Exported to {path}")
+    st.download_button("Download Match Data", buffer.getvalue(), file_name=f"{path.name}.zip",
+                       mime="application/zip")
+
+def saved_analyses():
+    if not EXPORT_DIR.exists():
+        return []
+    return sorted((p for p in EXPORT_DIR.iterdir() if p.is_dir() and not p.name.startswith(".")),
+                  key=lambda p: p.stat().st_mtime, reverse=True)
+
+def show_saved_analysis(path, frames=None, classes=None):
+    # Rebuilds the counts, heatmap, possession and commentary views without running the model
+    start = time.perf_counter()
+    match = load_match(path, frames=frames, classes=classes)
+    st.caption(f"Loaded {match.store.num_detections} detections in {len(match.frames)} frames "
+               f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # Counts of the filtered classes only, indexed by the original frame ids
+    counts = pd.DataFrame(match.counts(classes), index=pd.Index(match.frames["frame"].to_numpy(), name="frame"))
+    st.markdown("**Objects per Frame**")
+    st.line_chart(counts)
+
+    fig = generate_kde_plot(None, None, detections=match.store, calibration=match.calibration)
+    if fig:
+        st.pyplot(fig)
+        plt.close(fig)
+
+    with st.expander("Ball Possession"):
+        possession = possession_timeline(match.proximity, fps=match.fps)
+        for cls_id, frames_owned in possession["frames_in_possession"].items():
+            st.write(f"{CLASS_NAMES[cls_id]}: {frames_owned} frames")
+        st.write(f"Possession changes: {possession['possession_changes']}")
+
+    for line in match.commentary:
+        when = f"{line['time_s']:.1f}s" if match.fps else f"frame {line['frame_id']}"
+        st.write(f"AI Commentary ({when}):")
+        st.write(line["commentary"])
+
+def first_frame(video_path):
+    video_cap = cv2.VideoCapture(str(video_path))
+    success, image = video_cap.read()
+    video_cap.release()
+    return cv2.resize(image, FRAME_SIZE) if success else None
+
+def calibration_overlay(image, calibration=None, grid=50):
+    # Pixel grid to read point coordinates from, plus the calibrated landmarks
+    overlay = image.copy()
+    height, width = overlay.shape[:2]
+    for x in range(0, width, grid):
+        cv2.line(overlay, (x, 0), (x, height), (255, 255, 255), 1)
+        cv2.putText(overlay, str(x), (x + 2, 12), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (255, 255, 255), 1)
+    for y in range(grid, height, grid):
+        cv2.line(overlay, (0, y), (width, y), (255, 255, 255), 1)
+        cv2.putText(overlay, str(y), (2, y - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (255, 255, 255), 1)
+    if calibration is not None:
+        pitch_points = np.array(list(PITCH_KEYPOINTS.values()), dtype=np.float64).reshape(-1, 1, 2)
+        image_points = cv2.perspectiveTransform(pitch_points, np.linalg.inv(calibration.homography))
+        for x, y in image_points.reshape(-1, 2):
+            if 0 <= x < width and 0 <= y < height:
+                cv2.circle(overlay, (int(x), int(y)), 4, (0, 0, 255), -1)
+    return cv2.addWeighted(overlay, 0.6, image, 0.4, 0)[:, :, ::-1]
+
+def calibration_panel(video_path):
+    # Image-to-pitch homography for this video, saved per video content hash
+    calibration = load_calibration(video_path)
+    with st.expander("Pitch Calibration"):
+        if calibration is None:
+            st.caption("Not calibrated: the frame is stretched over the whole pitch and distances are in pixels.")
+        else:
+            calibration = calibration.for_frame_size(FRAME_SIZE)
+            error = f", reprojection error {calibration.error:.2f} m" if calibration.error is not None else ""
+            st.caption(f"Using {calibration.source} calibration{error}.")
+        image = first_frame(video_path)
+        if image is None:
+            st.warning("Could not read a frame for calibration.")
+            return calibration
+        st.image(calibration_overlay(image, calibration), caption="First frame (pixel grid, calibrated landmarks in red)",
+                 use_container_width=True)
+
+        if PITCH_KEYPOINT_MODEL.exists() and st.button("Detect Pitch Keypoints"):
+            try:
+                result = get_model(PITCH_KEYPOINT_MODEL).predict(image, verbose=False)[0]
+                calibration = PitchCalibration.from_keypoints(result)
+                save_calibration(video_path, calibration)
+                st.success(f"Calibrated from {PITCH_KEYPOINT_MODEL.name}.")
+            except ValueError as e:
+                st.error(e)
+
+        st.write("Or enter the pixel position of at least four visible landmarks:")
+        points = st.data_editor(
+            [{"landmark": name, "x": None, "y": None} for name in PITCH_KEYPOINTS],
+            column_config={
+                "landmark": st.column_config.TextColumn(disabled=True),
+                "x": st.column_config.NumberColumn(min_value=0, max_value=FRAME_SIZE[0]),
+                "y": st.column_config.NumberColumn(min_value=0, max_value=FRAME_SIZE[1]),
+            },
+            key=f"calibration_points_{video_path}",
+        )
+        if st.button("Save Calibration"):
+            landmarks = {row["landmark"]: (row["x"], row["y"]) for row in points
+                         if all(v is not None and not np.isnan(v) for v in (row["x"], row["y"]))}
+            try:
+                calibration = PitchCalibration.from_landmarks(landmarks, FRAME_SIZE)
+                save_calibration(video_path, calibration)
+                st.success(f"Calibration saved (reprojection error {calibration.error:.2f} m).")
+            except ValueError as e:
+                st.error(e)
+    return calibration
+
+def uploaded_video_path(uploaded_video):
+    # Stream each distinct upload to disk once per session, keyed by Streamlit's file id
+    paths = st.session_state.setdefault('upload_paths', {})
+    key = getattr(uploaded_video, 'file_id', None) or (uploaded_video.name, uploaded_video.size)
+    if key not in paths or not Path(paths[key]).exists():
+        paths[key] = save_upload(uploaded_video)
+    return paths[key]
+
 #Image / Video Configuration
 st.sidebar.header("Image/Video Config")
 source_radio = st.sidebar.radio(
@@ -172,106 +595,118 @@ elif source_radio == VIDEO:
     uploaded_video = st.sidebar.file_uploader(
         "Upload a Video...", type=("mp4", "avi", "mov", "mkv")
     )
+    export_format = st.sidebar.selectbox("Export Format", list(FORMATS))
     if uploaded_video is not None:
-        st.video(uploaded_video)
-        temp_video_path = "temp_uploaded_video.mp4"
-        with open(temp_video_path, "wb") as f:
-            f.write(uploaded_video.read())
+        temp_video_path = str(uploaded_video_path(uploaded_video))
+        st.video(temp_video_path)
+        calibration = calibration_panel(temp_video_path)
         detect_btn = st.sidebar.button("Detect Video Objects (Uploaded)")
         commentary_btn = st.sidebar.button("Generate Commentary (Uploaded Video)")
         kde_btn = st.sidebar.button("Generate KDE Plot (Uploaded Video)")  # <-- Added to sidebar
+        track_btn = st.sidebar.button("Track Players (Uploaded Video)")
+        export_btn = st.sidebar.button("Export Match Data (Uploaded Video)")
         if detect_btn:
             try:
-                video_cap = cv2.VideoCapture(temp_video_path)
-                st_frame = st.empty()
-                st.session_state['video_results'] = []
-                while video_cap.isOpened():
-                    success, image = video_cap.read()
-                    if success:
-                        image = cv2.resize(image, (720, int(720 * (9/16))))
-                        result = model.predict(image, conf=confidence_value)
-                        result_plotted = result[0].plot()
-                        st_frame.image(result_plotted, caption="Detected Video",
-                                       channels="BGR",
-                                       use_container_width=True)
-                        st.session_state['video_results'].append(result)
-                    else:
-                        video_cap.release()
-                        break
+                detect_video(temp_video_path, 'video_results')
             except Exception as e:
                 st.sidebar.error("Error Loading Uploaded Video: " + str(e))
         if commentary_btn:
             results = st.session_state.get('video_results', [])
             if results:
-                for idx, result in enumerate(results):
-                    if idx == 0:
-                        continue  # Skip frame 0
-                    if idx % 30 == 0:
-                        positions = extract_positions(result)
-                        positions["frame_id"] = idx  # ✅ Add this line
-                        commentary = generate_commentary(positions)
-                        audio_file = generate_audio(commentary)
-                        st.write(f"AI Commentary (frame {idx}):")
-                        st.write(commentary)
-                        st.audio(audio_file, format='audio/wav')
+                st.session_state['video_results_commentary'] = (
+                    st.session_state.get('video_results_key'),
+                    video_commentary(results, skip_first=True, calibration=calibration))  # Skip frame 0
             else:
                 st.warning("Please run detection first.")
 
         if kde_btn:
             with st.spinner("Generating KDE plot..."):
-                fig = generate_kde_plot(temp_video_path, str(model_path))
+                detections = get_detections(temp_video_path, 'video_results')
+                fig = generate_kde_plot(temp_video_path, str(model_path), detections=detections,
+                                        calibration=calibration)
                 if fig:
                     st.pyplot(fig)
                 else:
                     st.error("Failed to generate KDE plot.")
+
+        if track_btn:
+            with st.spinner("Tracking players..."):
+                show_tracks(temp_video_path, get_detections(temp_video_path, 'video_results'), calibration)
+
+        if export_btn:
+            with st.spinner("Exporting match data..."):
+                export_video(temp_video_path, 'video_results', uploaded_video.name, calibration, export_format)
     else:
         video_path = str(next(iter(VIDEOS_DICT.values())))
-        with open(video_path, 'rb') as video_file:
-            video_bytes = video_file.read()
-            if video_bytes:
-                st.video(video_bytes)
-            detect_btn = st.sidebar.button("Detect Video Objects")
-            commentary_btn = st.sidebar.button("Generate Commentary (Sample Video)")
-            kde_btn = st.sidebar.button("Generate KDE Plot (Sample Video)")  # <-- Added to sidebar
-            if detect_btn:
-                try:
-                    video_cap = cv2.VideoCapture(video_path)
-                    st_frame = st.empty()
-                    st.session_state['sample_video_results'] = []
-                    while video_cap.isOpened():
-                        success, image = video_cap.read()
-                        if success:
-                            image = cv2.resize(image, (720, int(720 * (9/16))))
-                            result = model.predict(image, conf = confidence_value)
-                            result_plotted = result[0].plot()
-                            st_frame.image(result_plotted, caption = "Detected Video",
-                                           channels = "BGR",
-                                           use_container_width=True)
-                            st.session_state['sample_video_results'].append(result)
-                        else:
-                            video_cap.release()
-                            break
-                except Exception as e:
-                    st.sidebar.error("Error Loading Video"+str(e))
-            if commentary_btn:
-                results = st.session_state.get('sample_video_results', [])
-                if results:
-                    for idx, result in enumerate(results):
-                        if idx % 30 == 0:
-                            positions = extract_positions(result)
-                            positions["frame_id"] = idx  # ✅ Add this line
-                            commentary = generate_commentary(positions)
-                            audio_file = generate_audio(commentary)
-                            st.write(f"AI Commentary (frame {idx}):")
-                            st.write(commentary)
-                            st.audio(audio_file, format='audio/wav')
+        # Streamlit serves the file from disk; no need to read it into memory here
+        st.video(video_path)
+        calibration = calibration_panel(video_path)
+        detect_btn = st.sidebar.button("Detect Video Objects")
+        commentary_btn = st.sidebar.button("Generate Commentary (Sample Video)")
+        kde_btn = st.sidebar.button("Generate KDE Plot (Sample Video)")  # <-- Added to sidebar
+        track_btn = st.sidebar.button("Track Players (Sample Video)")
+        export_btn = st.sidebar.button("Export Match Data (Sample Video)")
+        if detect_btn:
+            try:
+                detect_video(video_path, 'sample_video_results')
+            except Exception as e:
+                st.sidebar.error("Error Loading Video"+str(e))
+        if commentary_btn:
+            results = st.session_state.get('sample_video_results', [])
+            if results:
+                st.session_state['sample_video_results_commentary'] = (
+                    st.session_state.get('sample_video_results_key'),
+                    video_commentary(results, calibration=calibration))
+            else:
+                st.warning("Please run detection first.")
+
+        if kde_btn:
+            with st.spinner("Generating KDE plot..."):
+                detections = get_detections(video_path, 'sample_video_results')
+                fig = generate_kde_plot(video_path, str(model_path), detections=detections,
+                                        calibration=calibration)
+                if fig:
+                    st.pyplot(fig)
                 else:
-                    st.warning("Please run detection first.")
+                    st.error("Failed to generate KDE plot.")
 
-            if kde_btn:
-                with st.spinner("Generating KDE plot..."):
-                    fig = generate_kde_plot(video_path, str(model_path))
-                    if fig:
-                        st.pyplot(fig)
-                    else:
-                        st.error("Failed to generate KDE plot.")
\ No newline at end of file
+        if track_btn:
+            with st.spinner("Tracking players..."):
+                show_tracks(video_path, get_detections(video_path, 'sample_video_results'), calibration)
+
+        if export_btn:
+            with st.spinner("Exporting match data..."):
+                export_video(video_path, 'sample_video_results', Path(video_path).name, calibration, export_format)
+
+elif source_radio == LIVE:
+    source = st.sidebar.text_input("Stream Source (RTSP URL, webcam index or file path)",
+                                   value=str(next(iter(VIDEOS_DICT.values()))))
+    realtime = st.sidebar.checkbox("Replay Files at Real-Time Pace", value=True)
+    window = st.sidebar.slider("Rolling Window (frames)", 50, 1500, 300)
+    latency_budget_ms = st.sidebar.slider("Latency Budget per Frame (ms)", 50, 1000, 200)
+    commentary_every_s = st.sidebar.slider("Commentary Every N Seconds (0 = off)", 0, 60, 10)
+    start_btn = st.sidebar.button("Start Stream")
+    st.sidebar.button("Stop Stream")
+    if start_btn:
+        try:
+            live_stream(source, window, latency_budget_ms, realtime, commentary_every_s)
+        except Exception as e:
+            st.sidebar.error("Error Reading Stream: " + str(e))
+
+elif source_radio == SAVED:
+    analyses = saved_analyses()
+    if not analyses:
+        st.info(f"No saved analyses yet. Export one from the Video source; they are stored in {EXPORT_DIR}.")
+    else:
+        path = st.sidebar.selectbox("Saved Analysis", analyses, format_func=lambda p: p.name)
+        meta = read_metadata(path)
+        st.caption(f"{meta.get('video', path.name)}: {meta['num_frames']} frames, "
+                   f"{meta.get('task', '')} at confidence {meta.get('conf', '')}")
+        # Filters are pushed down to the file reader
+        start, stop = st.sidebar.slider("Frame Range", 0, max(meta["num_frames"], 1), (0, meta["num_frames"]))
+        classes = st.sidebar.multiselect("Classes", list(CLASS_NAMES), default=list(CLASS_NAMES),
+                                         format_func=CLASS_NAMES.get)
+        try:
+            show_saved_analysis(path, frames=(start, stop), classes=classes)
+        except Exception as e:
+            st.error("Error Loading Saved Analysis: " + str(e))
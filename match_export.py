@@ -0,0 +1,255 @@
+# match_export.py
+"""
+Columnar export of a match analysis: per-detection rows, per-frame counts
+and ball proximity, and commentary lines, written as Parquet (compressed,
+with row-group statistics for predicate pushdown) or Arrow IPC (memory-mapped,
+zero-copy reads).
+
+    export_match("analysis/match1", store, fps=25, commentary=lines)
+    match = load_match("analysis/match1", frames=(0, 750), classes=[2])
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from detection_store import DetectionStore
+from extract_positions import CLASS_NAMES, count_detected_objects_batch
+from pitch_calibration import PitchCalibration
+from proximity import ProximityTimeline, compute_proximity, PROXIMITY_THRESHOLD_M
+
+EXPORT_VERSION = 1
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+TABLES = ("detections", "frames", "commentary")
+# Rows per Parquet row group / Arrow record batch; frame-range filters skip whole groups
+ROW_GROUP_SIZE = 64 * 1024
+
+_META_KEY = b"ai_football_analyzer"
+
+
+def _write_table(table, path, format, row_group_size):
+    if format == "parquet":
+        pq.write_table(table, path, row_group_size=row_group_size, compression="zstd")
+    else:
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=row_group_size)
+
+
+def _read_table(path, predicate=None):
+    if path.suffix == ".parquet":
+        # Row groups whose frame/class statistics cannot match are never read
+        return pq.read_table(path, filters=predicate)
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.filter(predicate) if predicate is not None else table
+
+
+def _predicate(frames=None, classes=None):
+    predicate = None
+    if frames is not None:
+        start, stop = frames
+        predicate = (ds.field("frame") >= int(start)) & (ds.field("frame") < int(stop))
+    if classes is not None:
+        by_class = ds.field("cls").isin([int(c) for c in classes])
+        predicate = by_class if predicate is None else predicate & by_class
+    return predicate
+
+
+def export_match(path, store, fps=None, commentary=None, calibration=None, proximity=None,
+                 format="parquet", row_group_size=ROW_GROUP_SIZE, **metadata):
+    """
+    Writes detections, frames and commentary tables for a DetectionStore to
+    the directory path. commentary is a list of {"frame_id", "commentary"}
+    dicts. Ball proximity is computed unless given, in metres when a
+    PitchCalibration is passed. Extra keyword arguments are stored in the
+    file metadata.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format!r} (expected one of {list(FORMATS)})")
+    path = Path(path)
+    suffix = FORMATS[format]
+    columns = store.columns()
+    num_frames = len(store)
+    frame_ids = np.arange(num_frames, dtype=np.int32)
+    if proximity is None:
+        proximity = compute_proximity(store) if calibration is None else \
+            compute_proximity(store, PROXIMITY_THRESHOLD_M, calibration=calibration)
+
+    xywh = columns["xywh"]
+    detections = {
+        "row": np.arange(store.num_detections, dtype=np.int64),
+        "frame": columns["frame"].astype(np.int32),
+        "cls": columns["cls"].astype(np.int16),
+        "conf": columns["conf"].astype(np.float32),
+        "x": xywh[:, 0], "y": xywh[:, 1], "w": xywh[:, 2], "h": xywh[:, 3],
+    }
+    if calibration is not None:
+        pitch_xy = calibration.for_frame_size(store.frame_size).to_pitch(xywh[:, :2]).astype(np.float32)
+        detections["pitch_x"], detections["pitch_y"] = pitch_xy[:, 0], pitch_xy[:, 1]
+
+    frames = {"frame": frame_ids, "analysed": columns["analysed"][:num_frames].astype(bool)}
+    if fps:
+        frames["time_s"] = frame_ids / fps
+    for name, counts in count_detected_objects_batch(store).items():
+        frames[name] = counts.astype(np.int32)
+    frames.update({
+        "ball_x": proximity.ball_xy[:, 0].astype(np.float32),
+        "ball_y": proximity.ball_xy[:, 1].astype(np.float32),
+        "nearest_cls": proximity.nearest_cls.astype(np.int16),
+        "nearest_dist": proximity.nearest_dist.astype(np.float32),
+        "nearest_row": proximity.nearest_row.astype(np.int64),
+    })
+
+    lines = sorted(commentary or [], key=lambda line: line["frame_id"])
+    line_frames = np.array([line["frame_id"] for line in lines], dtype=np.int32)
+    commentary_table = {
+        "frame": line_frames,
+        "time_s": line_frames / fps if fps else np.full(len(lines), np.nan),
+        "commentary": pa.array([line["commentary"] for line in lines], type=pa.string()),
+    }
+
+    meta = {
+        "version": EXPORT_VERSION,
+        "num_frames": num_frames,
+        "frame_size": list(store.frame_size) if store.frame_size else None,
+        "names": store.names or CLASS_NAMES,
+        "fps": fps,
+        "proximity_threshold": proximity.threshold,
+        "proximity_units": "m" if calibration is not None else "px",
+        "calibration": calibration.to_dict() if calibration is not None else None,
+        **metadata,
+    }
+    schema_meta = {_META_KEY: json.dumps(meta).encode()}
+
+    # Written to a temporary directory and renamed, so readers never see a partial export
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    try:
+        for name, data in zip(TABLES, (detections, frames, commentary_table)):
+            table = pa.table(data).replace_schema_metadata(schema_meta)
+            _write_table(table, tmp / f"{name}{suffix}", format, row_group_size)
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return path
+
+
+class MatchData:
+    """
+    A loaded match export. store is a DetectionStore with the original
+    frame ids; frames outside the loaded range are empty and not analysed.
+    frames holds the per-frame table (counts, ball position, proximity).
+    """
+    def __init__(self, store, frames, commentary, proximity, meta):
+        self.store = store
+        self.frames = frames
+        self.commentary = commentary
+        self.proximity = proximity
+        self.meta = meta
+
+    @property
+    def fps(self):
+        return self.meta.get("fps")
+
+    @property
+    def calibration(self):
+        calibration = self.meta.get("calibration")
+        return PitchCalibration.from_dict(calibration) if calibration else None
+
+    def counts(self, classes=None):
+        """
+        Per-frame object counts of the loaded frames: class name to array,
+        for the given class ids or all classes.
+        """
+        return {name: self.frames[name].to_numpy() for cls_id, name in CLASS_NAMES.items()
+                if classes is None or cls_id in classes}
+
+
+def export_format(path):
+    path = Path(path)
+    for format, suffix in FORMATS.items():
+        if (path / f"detections{suffix}").exists():
+            return format
+    raise FileNotFoundError(f"No match export found in {path}")
+
+
+def read_metadata(path):
+    path = Path(path)
+    suffix = FORMATS[export_format(path)]
+    detections_path = path / f"detections{suffix}"
+    if suffix == ".parquet":
+        schema = pq.read_schema(detections_path)
+    else:
+        with pa.memory_map(str(detections_path)) as source:
+            schema = pa.ipc.open_file(source).schema
+    return json.loads(schema.metadata[_META_KEY])
+
+
+def load_match(path, frames=None, classes=None):
+    """
+    Loads a match export. frames=(start, stop) limits it to a half-open
+    frame range and classes to the given class ids; both are pushed down
+    to the reader, so only matching row groups are read from Parquet.
+    """
+    path = Path(path)
+    suffix = FORMATS[export_format(path)]
+    detections = _read_table(path / f"detections{suffix}", _predicate(frames, classes))
+    meta = json.loads(detections.schema.metadata[_META_KEY])
+    frame_table = _read_table(path / f"frames{suffix}", _predicate(frames))
+    commentary_table = _read_table(path / f"commentary{suffix}", _predicate(frames))
+
+    num_frames = meta["num_frames"]
+    if frames is not None:
+        num_frames = min(num_frames, max(int(frames[1]), 0))
+    loaded = frame_table["frame"].to_numpy()
+
+    frame = detections["frame"].to_numpy()
+    offsets = np.zeros(num_frames + 1, dtype=np.int64)
+    np.cumsum(np.bincount(frame, minlength=num_frames), out=offsets[1:])
+    analysed = np.zeros(num_frames, dtype=bool)
+    analysed[loaded] = frame_table["analysed"].to_numpy()
+    xywh = np.column_stack([detections[c].to_numpy() for c in ("x", "y", "w", "h")]) \
+        if detections.num_rows else np.empty((0, 4), dtype=np.float32)
+    names = {int(k): v for k, v in meta["names"].items()} if meta.get("names") else None
+    store = DetectionStore.from_columns(
+        detections["cls"].to_numpy(), detections["conf"].to_numpy(), xywh, offsets,
+        frame=frame, analysed=analysed,
+        frame_size=tuple(meta["frame_size"]) if meta.get("frame_size") else None, names=names,
+    )
+
+    # Proximity over the loaded frames, with nearest_row remapped to the loaded detection rows
+    ball_xy = np.full((num_frames, 2), np.nan)
+    ball_xy[loaded, 0] = frame_table["ball_x"].to_numpy()
+    ball_xy[loaded, 1] = frame_table["ball_y"].to_numpy()
+    nearest_cls = np.full(num_frames, -1, dtype=np.int64)
+    nearest_dist = np.full(num_frames, np.nan)
+    nearest_row = np.full(num_frames, -1, dtype=np.int64)
+    rows = detections["row"].to_numpy()
+    exported_row = frame_table["nearest_row"].to_numpy()
+    local = np.clip(np.searchsorted(rows, exported_row), 0, max(len(rows) - 1, 0))
+    found = (exported_row >= 0) & (len(rows) > 0)
+    if len(rows):
+        found &= rows[local] == exported_row
+    nearest_cls[loaded] = frame_table["nearest_cls"].to_numpy()
+    nearest_dist[loaded] = frame_table["nearest_dist"].to_numpy()
+    # -1 where the nearest entity's class was filtered out
+    nearest_row[loaded] = np.where(found, local, -1)
+    proximity = ProximityTimeline(ball_xy, nearest_cls, nearest_dist, nearest_row,
+                                  meta.get("proximity_threshold"))
+
+    commentary = [
+        {"frame_id": int(f), "time_s": t, "commentary": c}
+        for f, t, c in zip(commentary_table["frame"].to_pylist(), commentary_table["time_s"].to_pylist(),
+                           commentary_table["commentary"].to_pylist())
+    ]
+    return MatchData(store, frame_table, commentary, proximity, meta)
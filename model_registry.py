@@ -0,0 +1,81 @@
+# model_registry.py
+
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+
+WARMUP_SHAPE = (640, 640, 3)
+
+
+class SharedModel:
+    """
+    A YOLO instance shared across sessions. predict() is serialized with a
+    per-model lock because the ultralytics predictor keeps per-call state.
+    Other attributes are forwarded to the wrapped model.
+    """
+    def __init__(self, model, weights_path):
+        self.model = model
+        self.weights_path = weights_path
+        self.lock = threading.Lock()
+        self.load_s = 0.0
+        self.warmup_s = 0.0
+
+    def predict(self, *args, **kwargs):
+        with self.lock:
+            return self.model.predict(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self.predict(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+_models = {}
+_load_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _load(weights_path, warmup):
+    start = time.perf_counter()
+    shared = SharedModel(YOLO(weights_path), weights_path)
+    shared.load_s = time.perf_counter() - start
+    if warmup:
+        # One dummy inference so the first real frame does not pay for lazy setup
+        start = time.perf_counter()
+        shared.predict(np.zeros(WARMUP_SHAPE, dtype=np.uint8), verbose=False)
+        shared.warmup_s = time.perf_counter() - start
+    return shared
+
+
+def get_model(weights_path, warmup=True):
+    """
+    Returns the process-wide SharedModel for a weights file, loading and
+    warming it up on first use.
+    """
+    key = str(Path(weights_path).resolve())
+    shared = _models.get(key)
+    if shared is not None:
+        return shared
+    with _registry_lock:
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+    # Only one thread loads a given file; others wait for it instead of loading a copy
+    with load_lock:
+        shared = _models.get(key)
+        if shared is None:
+            shared = _load(weights_path, warmup)
+            _models[key] = shared
+    return shared
+
+
+def load_report():
+    """
+    Load and warm-up seconds for every model loaded in this process.
+    """
+    return {
+        Path(key).name: {"load_s": round(m.load_s, 3), "warmup_s": round(m.warmup_s, 3)}
+        for key, m in list(_models.items())
+    }
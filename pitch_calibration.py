@@ -0,0 +1,184 @@
+# pitch_calibration.py
+
+import json
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from detection_cache import file_hash
+from heatmap import PITCH_LENGTH, PITCH_WIDTH
+
+CALIBRATION_DIR = Path(os.environ.get(
+    "FOOTBALL_CALIBRATION_DIR", Path.home() / ".cache" / "ai_football_analyzer" / "calibration"
+))
+
+# Real pitch size in metres; the origin is the top-left corner flag
+PITCH_LENGTH_M = 105.0
+PITCH_WIDTH_M = 68.0
+
+_MID_Y = PITCH_WIDTH_M / 2
+_BOX_Y = 40.32 / 2
+_SIX_Y = 18.32 / 2
+
+# Pitch line landmarks in metres. A pitch keypoint model is expected to
+# output its keypoints in this order.
+PITCH_KEYPOINTS = {
+    "corner_top_left": (0.0, 0.0),
+    "corner_bottom_left": (0.0, PITCH_WIDTH_M),
+    "corner_top_right": (PITCH_LENGTH_M, 0.0),
+    "corner_bottom_right": (PITCH_LENGTH_M, PITCH_WIDTH_M),
+    "halfway_top": (PITCH_LENGTH_M / 2, 0.0),
+    "halfway_bottom": (PITCH_LENGTH_M / 2, PITCH_WIDTH_M),
+    "centre_spot": (PITCH_LENGTH_M / 2, _MID_Y),
+    "centre_circle_top": (PITCH_LENGTH_M / 2, _MID_Y - 9.15),
+    "centre_circle_bottom": (PITCH_LENGTH_M / 2, _MID_Y + 9.15),
+    "left_box_goal_line_top": (0.0, _MID_Y - _BOX_Y),
+    "left_box_goal_line_bottom": (0.0, _MID_Y + _BOX_Y),
+    "left_box_top": (16.5, _MID_Y - _BOX_Y),
+    "left_box_bottom": (16.5, _MID_Y + _BOX_Y),
+    "left_six_top": (5.5, _MID_Y - _SIX_Y),
+    "left_six_bottom": (5.5, _MID_Y + _SIX_Y),
+    "left_penalty_spot": (11.0, _MID_Y),
+    "right_box_goal_line_top": (PITCH_LENGTH_M, _MID_Y - _BOX_Y),
+    "right_box_goal_line_bottom": (PITCH_LENGTH_M, _MID_Y + _BOX_Y),
+    "right_box_top": (PITCH_LENGTH_M - 16.5, _MID_Y - _BOX_Y),
+    "right_box_bottom": (PITCH_LENGTH_M - 16.5, _MID_Y + _BOX_Y),
+    "right_six_top": (PITCH_LENGTH_M - 5.5, _MID_Y - _SIX_Y),
+    "right_six_bottom": (PITCH_LENGTH_M - 5.5, _MID_Y + _SIX_Y),
+    "right_penalty_spot": (PITCH_LENGTH_M - 11.0, _MID_Y),
+}
+KEYPOINT_ORDER = tuple(PITCH_KEYPOINTS)
+
+
+class PitchCalibration:
+    """
+    Image-to-pitch homography for frames of frame_size (width, height).
+    to_pitch maps pixel points to metres with one cv2.perspectiveTransform
+    call; to_statsbomb maps them to the 120x80 pitch used by the heatmaps.
+    """
+    def __init__(self, homography, frame_size, error=None, source="manual"):
+        self.homography = np.asarray(homography, dtype=np.float64)
+        self.frame_size = tuple(int(v) for v in frame_size)
+        # Mean reprojection error of the calibration points, in metres
+        self.error = error
+        self.source = source
+
+    @classmethod
+    def from_points(cls, image_points, pitch_points, frame_size, source="manual"):
+        """
+        Fits the homography to at least four image/pitch point pairs.
+        With more than four, RANSAC discards badly placed points.
+        """
+        image_points = np.asarray(image_points, dtype=np.float64).reshape(-1, 2)
+        pitch_points = np.asarray(pitch_points, dtype=np.float64).reshape(-1, 2)
+        if len(image_points) < 4:
+            raise ValueError(f"At least 4 calibration points are needed, got {len(image_points)}")
+        method = cv2.RANSAC if len(image_points) > 4 else 0
+        homography, inliers = cv2.findHomography(image_points, pitch_points, method, 1.0)
+        if homography is None:
+            raise ValueError("Could not fit a homography; check that the points are not collinear")
+        projected = cv2.perspectiveTransform(image_points.reshape(-1, 1, 2), homography).reshape(-1, 2)
+        used = inliers.ravel().astype(bool) if inliers is not None else slice(None)
+        error = float(np.hypot(*(projected - pitch_points)[used].T).mean())
+        return cls(homography, frame_size, error=error, source=source)
+
+    @classmethod
+    def from_landmarks(cls, landmarks, frame_size, source="manual"):
+        """
+        Calibration from a dictionary of PITCH_KEYPOINTS name to pixel (x, y).
+        """
+        names = [name for name, xy in landmarks.items() if xy is not None]
+        unknown = set(names) - set(PITCH_KEYPOINTS)
+        if unknown:
+            raise ValueError(f"Unknown pitch landmarks: {sorted(unknown)}")
+        return cls.from_points([landmarks[n] for n in names],
+                               [PITCH_KEYPOINTS[n] for n in names], frame_size, source)
+
+    @classmethod
+    def from_keypoints(cls, result, keypoint_names=KEYPOINT_ORDER, min_conf=0.5):
+        """
+        Calibration from one ultralytics pose result of a pitch keypoint
+        model, using the keypoints detected with at least min_conf.
+        """
+        keypoints = result.keypoints
+        if keypoints is None or len(keypoints) == 0:
+            raise ValueError("No pitch keypoints detected")
+        xy = keypoints.xy[0].cpu().numpy()
+        conf = keypoints.conf[0].cpu().numpy() if keypoints.conf is not None else np.ones(len(xy))
+        height, width = result.orig_shape
+        landmarks = {
+            name: tuple(point) for name, point, c in zip(keypoint_names, xy.tolist(), conf.tolist())
+            if c >= min_conf
+        }
+        return cls.from_landmarks(landmarks, (width, height), source="keypoints")
+
+    @classmethod
+    def default(cls, frame_size):
+        """
+        Calibration that stretches the whole frame over the whole pitch,
+        the mapping used when no calibration is available.
+        """
+        width, height = frame_size
+        homography = np.diag([PITCH_LENGTH_M / width, PITCH_WIDTH_M / height, 1.0])
+        return cls(homography, frame_size, source="default")
+
+    def for_frame_size(self, frame_size):
+        """
+        The same calibration for frames resized to frame_size.
+        """
+        frame_size = tuple(int(v) for v in frame_size)
+        if frame_size == self.frame_size:
+            return self
+        scale = np.diag([self.frame_size[0] / frame_size[0], self.frame_size[1] / frame_size[1], 1.0])
+        return PitchCalibration(self.homography @ scale, frame_size, self.error, self.source)
+
+    def to_pitch(self, xy):
+        """
+        Pitch coordinates in metres for an (n, 2) array of pixel points.
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 1, 2)
+        if len(xy) == 0:
+            return np.empty((0, 2))
+        return cv2.perspectiveTransform(xy, self.homography).reshape(-1, 2)
+
+    def to_statsbomb(self, xy):
+        return self.to_pitch(xy) * (PITCH_LENGTH / PITCH_LENGTH_M, PITCH_WIDTH / PITCH_WIDTH_M)
+
+    def to_dict(self):
+        return {
+            "homography": self.homography.tolist(),
+            "frame_size": list(self.frame_size),
+            "error": self.error,
+            "source": self.source,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["homography"], data["frame_size"], data.get("error"), data.get("source", "manual"))
+
+
+def _calibration_path(video_path, calibration_dir):
+    return Path(calibration_dir) / f"{file_hash(video_path)}.json"
+
+
+def load_calibration(video_path, calibration_dir=CALIBRATION_DIR):
+    """
+    Saved calibration for a video (by content hash), or None.
+    """
+    try:
+        with open(_calibration_path(video_path, calibration_dir)) as f:
+            return PitchCalibration.from_dict(json.load(f))
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+
+def save_calibration(video_path, calibration, calibration_dir=CALIBRATION_DIR):
+    path = _calibration_path(video_path, calibration_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(calibration.to_dict(), f)
+    os.replace(tmp, path)
+    return path
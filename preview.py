@@ -0,0 +1,38 @@
+# preview.py
+
+import threading
+import time
+
+import cv2
+
+
+class PreviewThrottle:
+    """
+    Limits the live preview to at most max_fps frames per second and
+    JPEG-encodes the frames that will be shown. Frames that are not due
+    are never drawn or encoded, so analysis speed does not depend on the UI.
+    """
+    def __init__(self, max_fps=5, jpeg_quality=75):
+        self.interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.jpeg_quality = int(jpeg_quality)
+        self.shown = 0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def due(self, now=None):
+        """
+        True if the next preview frame may be shown now; claims the slot.
+        """
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self._last is not None and now - self._last < self.interval:
+                return False
+            self._last = now
+            self.shown += 1
+            return True
+
+    def encode(self, image):
+        success, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not success:
+            raise ValueError("Could not encode preview frame")
+        return buffer.tobytes()
@@ -0,0 +1,113 @@
+# profiling.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class _NullStage:
+    # Returned while profiling is disabled, so a timed block costs one call
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Hot-path stage timer. Wrap a block in `with profiler.stage("name"):` to
+    time it. Durations are kept in a rolling window per stage for summary
+    stats, and as events that can be exported as a Chrome trace
+    (chrome://tracing or Perfetto).
+    """
+    def __init__(self, enabled=False, window=500, max_events=100_000):
+        self.enabled = enabled
+        self.window = window
+        self._durations = {}
+        self._events = deque(maxlen=max_events)
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, start_ns, duration_ns):
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = deque(maxlen=self.window)
+            durations.append(duration_ns)
+            self._events.append((name, start_ns, duration_ns, os.getpid(), threading.get_ident()))
+
+    def stats(self):
+        """
+        Rolling count, mean, p50, p95 and total milliseconds per stage.
+        """
+        with self._lock:
+            snapshot = {name: np.asarray(d, dtype=np.float64) / 1e6 for name, d in self._durations.items()}
+        return {
+            name: {
+                "count": len(ms),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "total_ms": round(float(ms.sum()), 1),
+            }
+            for name, ms in sorted(snapshot.items()) if len(ms)
+        }
+
+    def chrome_trace(self):
+        with self._lock:
+            events = list(self._events)
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self._origin) / 1000,
+                    "dur": duration / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, duration, pid, tid in events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def trace_json(self):
+        return json.dumps(self.chrome_trace())
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._events.clear()
+
+
+# Process-wide profiler; set FOOTBALL_PROFILE=1 to enable it from the start
+profiler = Profiler(enabled=os.environ.get("FOOTBALL_PROFILE") == "1")
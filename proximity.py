@@ -0,0 +1,123 @@
+# proximity.py
+
+import numpy as np
+
+from extract_positions import CLASS_NAMES, BALL_CLASS, PROXIMITY_ENTITIES
+
+# Ball proximity threshold in metres, for calibrated videos
+PROXIMITY_THRESHOLD_M = 2.0
+
+# Class ids that can be "close to the ball" (same entities as find_ball_proximity)
+PROXIMITY_CLASSES = np.array(
+    [cls_id for cls_id, name in CLASS_NAMES.items() if name in PROXIMITY_ENTITIES]
+)
+
+
+class ProximityTimeline:
+    """
+    Nearest entity to the ball for every frame of a DetectionStore.
+    Frames without a ball, or with nobody within the threshold, have
+    nearest_cls == -1, nearest_row == -1 and nearest_dist == nan.
+    nearest_row indexes the store's detection columns.
+    """
+    def __init__(self, ball_xy, nearest_cls, nearest_dist, nearest_row, threshold):
+        self.ball_xy = ball_xy
+        self.nearest_cls = nearest_cls
+        self.nearest_dist = nearest_dist
+        self.nearest_row = nearest_row
+        self.threshold = threshold
+
+    def __len__(self):
+        return len(self.nearest_cls)
+
+    def entity(self, frame_id):
+        """
+        (entity_type, distance) for one frame, like find_ball_proximity.
+        """
+        cls_id = int(self.nearest_cls[frame_id])
+        if cls_id < 0:
+            return None, None
+        return CLASS_NAMES[cls_id], float(self.nearest_dist[frame_id])
+
+
+def compute_proximity(store, threshold=50, calibration=None):
+    """
+    Ball proximity for all frames at once. Uses the last ball detection of
+    each frame and truncated pixel centres, matching extract_positions.
+    With a PitchCalibration, centres are mapped to the pitch first and
+    threshold and distances are in metres.
+    """
+    num_frames = len(store)
+    columns = store.columns()
+    cls_ids = columns["cls"].astype(np.int64)
+    frames = columns["frame"].astype(np.int64)
+    if calibration is None:
+        xy = columns["xywh"][:, :2].astype(int).astype(np.float64)
+    else:
+        xy = calibration.for_frame_size(store.frame_size).to_pitch(columns["xywh"][:, :2])
+
+    # Last ball row of each frame (rows are stored in frame order)
+    ball_rows = np.flatnonzero(cls_ids == BALL_CLASS)
+    ball_frames = frames[ball_rows]
+    last = np.ones(len(ball_rows), dtype=bool)
+    last[:-1] = ball_frames[:-1] != ball_frames[1:]
+    ball_xy = np.full((num_frames, 2), np.nan)
+    ball_xy[ball_frames[last]] = xy[ball_rows[last]]
+
+    # Distance from every candidate entity to the ball of its frame
+    candidates = np.flatnonzero(np.isin(cls_ids, PROXIMITY_CLASSES))
+    candidate_frames = frames[candidates]
+    offset = xy[candidates] - ball_xy[candidate_frames]
+    dist = np.hypot(offset[:, 0], offset[:, 1])
+    within = dist < threshold  # nan (no ball) compares False
+    candidates, candidate_frames, dist = candidates[within], candidate_frames[within], dist[within]
+
+    # Closest candidate per frame; the stable sort keeps the first row on ties
+    order = np.lexsort((dist, candidate_frames))
+    sorted_frames = candidate_frames[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_frames[1:] != sorted_frames[:-1]
+    winners = order[first]
+
+    nearest_row = np.full(num_frames, -1, dtype=np.int64)
+    nearest_dist = np.full(num_frames, np.nan)
+    nearest_row[candidate_frames[winners]] = candidates[winners]
+    nearest_dist[candidate_frames[winners]] = dist[winners]
+    nearest_cls = np.full(num_frames, -1, dtype=np.int64)
+    nearest_cls[nearest_row >= 0] = cls_ids[nearest_row[nearest_row >= 0]]
+    return ProximityTimeline(ball_xy, nearest_cls, nearest_dist, nearest_row, threshold)
+
+
+def possession_timeline(timeline, owner=None, fps=None):
+    """
+    Possession spans from a ProximityTimeline. owner gives the possessing
+    identity per frame (-1 for none) and defaults to the nearest class;
+    pass per-frame track ids to get possession by individual.
+    Frames without an owner do not break a span of the same owner.
+    """
+    owner = timeline.nearest_cls if owner is None else np.asarray(owner)
+    owned = np.flatnonzero(owner >= 0)
+    owners = owner[owned]
+
+    # Run-length encode the owner sequence over frames that have one
+    change = np.ones(len(owned), dtype=bool)
+    change[1:] = owners[1:] != owners[:-1]
+    starts = np.flatnonzero(change)
+    ends = np.append(starts[1:], len(owned)) - 1
+    spans = [
+        {"owner": int(owners[a]), "start_frame": int(owned[a]), "end_frame": int(owned[b])}
+        for a, b in zip(starts.tolist(), ends.tolist())
+    ]
+
+    values, frame_counts = np.unique(owners, return_counts=True)
+    summary = {
+        "frames": len(owner),
+        "frames_in_possession": {int(v): int(n) for v, n in zip(values, frame_counts)},
+        "possession_changes": max(len(spans) - 1, 0),
+        "spans": spans,
+    }
+    if fps:
+        summary["seconds_in_possession"] = {
+            int(v): round(int(n) / fps, 2) for v, n in zip(values, frame_counts)
+        }
+    return summary
@@ -0,0 +1,40 @@
+import commentary_generator as cg
+
+# No ball, so every frame goes to the language model with the same scene signature
+POSITIONS = {"players": [(10, 10)], "goalkeepers": [], "main_referees": [],
+             "side_referees": [], "staff_members": [], "ball": None}
+
+
+def fake_generate(texts):
+    calls = []
+
+    def generate(prompts, batch_size):
+        calls.append(len(prompts))
+        return [prompt + " " + texts[len(calls) - 1] for prompt in prompts]
+    return generate, calls
+
+
+def test_poor_generations_are_not_cached(monkeypatch):
+    good = "A sweeping move down the left as the midfield pushes forward with real intent."
+    generate, calls = fake_generate(["nice.", good])
+    monkeypatch.setattr(cg, "_generate", generate)
+    monkeypatch.setattr(cg, "commentary_cache", cg.CommentaryCache(variants=3))
+    monkeypatch.setattr(cg, "last_commentary", "")
+
+    first = cg.generate_commentary_batch([dict(POSITIONS, frame_id=i) for i in range(3)])
+    assert first == [cg.FALLBACK_COMMENTARY] * 3
+    situation, _, entity = cg.describe_frame(POSITIONS)
+    assert cg.commentary_cache.missing(cg.scene_signature(situation, entity)) == 3
+
+    # The scene is generated again rather than stuck on the fallback
+    second = cg.generate_commentary_batch([dict(POSITIONS, frame_id=3)])
+    assert calls == [3, 1]
+    assert second[0].startswith("A sweeping move")
+
+
+def test_hit_and_miss_counts():
+    cache = cg.CommentaryCache()
+    cache.record(hits=2, misses=1)
+    cache.record(hits=1, misses=0)
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,23 @@
+import numpy as np
+
+from detection_store import DetectionStore
+from proximity import compute_proximity, possession_timeline
+
+
+def test_compute_proximity_without_detections():
+    store = DetectionStore(frame_size=(720, 405))
+    for _ in range(5):
+        store.append_frame(np.empty(0), np.empty(0), np.empty((0, 4)))
+    timeline = compute_proximity(store)
+    assert timeline.nearest_cls.tolist() == [-1] * 5
+    assert possession_timeline(timeline)["possession_changes"] == 0
+
+
+def test_compute_proximity_nearest_player():
+    store = DetectionStore(frame_size=(720, 405))
+    # Ball, a near player and a far goalkeeper
+    store.append_frame([2, 0, 1], [0.9] * 3, [[100, 100, 5, 5], [110, 100, 20, 40], [300, 100, 20, 40]])
+    store.append_frame([0], [0.9], [[110, 100, 20, 40]])
+    timeline = compute_proximity(store)
+    assert timeline.entity(0) == ("players", 10.0)
+    assert timeline.entity(1) == (None, None)
@@ -0,0 +1,46 @@
+import numpy as np
+
+from tracker import IoUTracker, track_store
+from detection_store import DetectionStore
+
+
+def player_box(frame, speed=10.0):
+    return np.array([[100.0 + speed * frame, 200.0, 20.0, 40.0]])
+
+
+def test_track_keeps_id_through_occlusion():
+    tracker = IoUTracker()
+    ids = []
+    for frame in range(10):
+        if 3 <= frame <= 5:
+            ids.append(tracker.update(np.empty((0, 4)), np.empty(0), np.empty(0)))
+            continue
+        ids.append(tracker.update(player_box(frame), [0.9], [0]))
+    seen = np.concatenate([i for i in ids if len(i)])
+    assert set(seen.tolist()) == {0}
+    # Velocity after the gap is per frame, not the whole gap's displacement
+    np.testing.assert_allclose(tracker.velocity[0], [10.0, 0.0, 10.0, 0.0])
+
+
+def test_track_keeps_id_with_frame_sampling_and_occlusion():
+    tracker = IoUTracker()
+    frames = [0, 2, 4, 10, 12]  # every 2nd frame analysed, player missed at 6 and 8
+    last = None
+    ids = []
+    for frame in frames:
+        steps = 1 if last is None else frame - last
+        ids.append(tracker.update(player_box(frame, speed=5.0), [0.9], [0], steps)[0])
+        last = frame
+    assert ids == [0] * len(frames)
+
+
+def test_track_store_single_track_speed():
+    store = DetectionStore(frame_size=(720, 405))
+    for frame in range(20):
+        if frame in (7, 8):
+            store.append_frame(np.empty(0), np.empty(0), np.empty((0, 4)))
+        else:
+            store.append_frame([0], [0.9], player_box(frame))
+    tracks, _ = track_store(store, fps=25)
+    assert len(tracks) == 1
+    np.testing.assert_allclose(tracks.speeds(), [250.0])
@@ -1,21 +1,113 @@
 # text_to_audio.py
-# text_to_audio.py
-import pyttsx3
-import tempfile
+import atexit
+import hashlib
+import multiprocessing
 import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-def generate_audio(commentary):
-    engine = pyttsx3.init()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
-        temp_path = f.name
-    engine.save_to_file(commentary, temp_path)
-    engine.runAndWait()
-    
-    # Read and return the audio as bytes
-    with open(temp_path, "rb") as audio_file:
-        audio_bytes = audio_file.read()
-
-    # Optional: delete temp file
-    os.remove(temp_path)
+import pyttsx3
+
+from profiling import profiler
+
+# RAM-backed scratch directory where available, so the WAV never touches the disk
+SCRATCH_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+AUDIO_CACHE_SIZE = 256
+TTS_WORKERS = 2
+
+_engine = None
+_engine_lock = threading.Lock()
+_audio_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_engine():
+    # One engine per process, reused for every line
+    global _engine
+    if _engine is None:
+        _engine = pyttsx3.init()
+    return _engine
 
+def _synthesize(commentary):
+    engine = _get_engine()
+    fd, temp_path = tempfile.mkstemp(suffix=".wav", dir=SCRATCH_DIR)
+    os.close(fd)
+    try:
+        with profiler.stage("tts.synthesize"):
+            engine.save_to_file(commentary, temp_path)
+            engine.runAndWait()
+
+        # Read and return the audio as bytes
+        with open(temp_path, "rb") as audio_file:
+            return audio_file.read()
+    finally:
+        os.remove(temp_path)
+
+def _text_key(commentary):
+    return hashlib.sha1(commentary.encode("utf-8")).hexdigest()
+
+def _cache_get(key):
+    with _cache_lock:
+        audio = _audio_cache.get(key)
+        if audio is not None:
+            _audio_cache.move_to_end(key)
+        return audio
+
+def _cache_put(key, audio):
+    with _cache_lock:
+        _audio_cache[key] = audio
+        _audio_cache.move_to_end(key)
+        while len(_audio_cache) > AUDIO_CACHE_SIZE:
+            _audio_cache.popitem(last=False)
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn, not fork: the parent is multi-threaded and may hold its own initialized engine
+            _pool = ProcessPoolExecutor(max_workers=TTS_WORKERS, initializer=_get_engine,
+                                        mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pool.shutdown, wait=False)
+        return _pool
+
+def generate_audio(commentary):
+    key = _text_key(commentary)
+    audio_bytes = _cache_get(key)
+    if audio_bytes is None:
+        with _engine_lock:
+            audio_bytes = _synthesize(commentary)
+        _cache_put(key, audio_bytes)
     return audio_bytes
+
+def generate_audio_batch(commentaries):
+    """
+    WAV bytes for each commentary line. Repeated and cached lines are
+    synthesized once; the rest run concurrently on a pool of TTS workers,
+    each holding its own engine.
+    """
+    keys = [_text_key(text) for text in commentaries]
+    audio = {}
+    missing = OrderedDict()
+    for key, text in zip(keys, commentaries):
+        cached = _cache_get(key)
+        if cached is not None:
+            audio[key] = cached
+        else:
+            missing.setdefault(key, text)
+
+    if len(missing) == 1:
+        key, text = next(iter(missing.items()))
+        audio[key] = generate_audio(text)
+    elif missing:
+        # tts.synthesize stages run in the worker processes and never reach this
+        # process's profiler, so the batch is timed here as a whole
+        with profiler.stage("tts.batch"):
+            results = list(_get_pool().map(_synthesize, missing.values()))
+        for key, audio_bytes in zip(missing, results):
+            _cache_put(key, audio_bytes)
+            audio[key] = audio_bytes
+
+    return [audio[key] for key in keys]
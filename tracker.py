@@ -0,0 +1,243 @@
+# tracker.py
+
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from extract_positions import CLASS_NAMES, BALL_CLASS
+from heatmap import PitchHeatmap
+
+# Everyone except the ball gets an identity
+TRACKED_CLASSES = tuple(cls_id for cls_id in CLASS_NAMES if cls_id != BALL_CLASS)
+
+
+def xywh_to_xyxy(xywh):
+    xy, wh = xywh[:, :2], xywh[:, 2:4] / 2
+    return np.hstack([xy - wh, xy + wh])
+
+
+def iou_matrix(a, b):
+    """
+    Pairwise IoU between two sets of xyxy boxes.
+    """
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class IoUTracker:
+    """
+    SORT/ByteTrack-style tracker over existing detections. Track boxes are
+    moved with a constant-velocity estimate, then matched to detections by
+    IoU with Hungarian assignment: high-confidence detections first, then
+    low-confidence ones against the tracks still unmatched. Tracks only
+    match detections of the same class and are dropped after max_age frames
+    without a match. All track state lives in NumPy arrays.
+    """
+    def __init__(self, iou_threshold=0.3, max_age=30, high_conf=0.5, classes=TRACKED_CLASSES):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.high_conf = high_conf
+        self.classes = np.asarray(classes)
+        self.boxes = np.empty((0, 4))
+        self.velocity = np.empty((0, 4))
+        self.cls = np.empty(0, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.misses = np.empty(0, dtype=np.int64)
+        self.next_id = 0
+        self.frame_times = []
+
+    def _match(self, tracks, dets, track_boxes, det_boxes, det_cls):
+        if len(tracks) == 0 or len(dets) == 0:
+            return [], tracks, dets
+        iou = iou_matrix(track_boxes[tracks], det_boxes[dets])
+        iou[self.cls[tracks][:, None] != det_cls[dets][None, :]] = 0
+        rows, cols = linear_sum_assignment(-iou)
+        good = iou[rows, cols] >= self.iou_threshold
+        rows, cols = rows[good], cols[good]
+        matches = list(zip(tracks[rows].tolist(), dets[cols].tolist()))
+        return matches, np.delete(tracks, rows), np.delete(dets, cols)
+
+    def update(self, xywh, conf, cls, steps=1):
+        """
+        Associates one frame of detections. steps is the number of frames
+        since the previous update (more than 1 with frame sampling).
+        Returns a track id per detection, -1 for untracked classes.
+        """
+        start = time.perf_counter()
+        cls = np.asarray(cls, dtype=np.int64)
+        conf = np.asarray(conf)
+        det_ids = np.full(len(cls), -1, dtype=np.int64)
+        tracked = np.flatnonzero(np.isin(cls, self.classes))
+        det_boxes = xywh_to_xyxy(np.asarray(xywh, dtype=np.float64).reshape(-1, 4))
+
+        # Frames since each track's last match; unmatched tracks keep moving along their velocity
+        gap = self.misses + steps
+        predicted = self.boxes + self.velocity * gap[:, None]
+        all_tracks = np.arange(len(self.ids))
+        high = tracked[conf[tracked] >= self.high_conf]
+        low = tracked[conf[tracked] < self.high_conf]
+        matches, left_tracks, left_high = self._match(all_tracks, high, predicted, det_boxes, cls)
+        low_matches, _, _ = self._match(left_tracks, low, predicted, det_boxes, cls)
+        matches += low_matches
+
+        matched_tracks = np.array([t for t, _ in matches], dtype=np.int64)
+        matched_dets = np.array([d for _, d in matches], dtype=np.int64)
+        self.misses += steps
+        if len(matches):
+            new_boxes = det_boxes[matched_dets]
+            self.velocity[matched_tracks] = (new_boxes - self.boxes[matched_tracks]) / gap[matched_tracks, None]
+            self.boxes[matched_tracks] = new_boxes
+            self.misses[matched_tracks] = 0
+            det_ids[matched_dets] = self.ids[matched_tracks]
+
+        # Unmatched high-confidence detections start new tracks
+        if len(left_high):
+            new_ids = np.arange(self.next_id, self.next_id + len(left_high))
+            self.next_id += len(left_high)
+            self.boxes = np.vstack([self.boxes, det_boxes[left_high]])
+            self.velocity = np.vstack([self.velocity, np.zeros((len(left_high), 4))])
+            self.cls = np.concatenate([self.cls, cls[left_high]])
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.misses = np.concatenate([self.misses, np.zeros(len(left_high), dtype=np.int64)])
+            det_ids[left_high] = new_ids
+
+        alive = self.misses <= self.max_age
+        self.boxes, self.velocity = self.boxes[alive], self.velocity[alive]
+        self.cls, self.ids, self.misses = self.cls[alive], self.ids[alive], self.misses[alive]
+
+        self.frame_times.append(time.perf_counter() - start)
+        return det_ids
+
+    def timing(self):
+        """
+        Association cost per frame in milliseconds.
+        """
+        times = np.asarray(self.frame_times) * 1000
+        if len(times) == 0:
+            return {"frames": 0}
+        return {
+            "frames": len(times),
+            "mean_ms": round(float(times.mean()), 3),
+            "p95_ms": round(float(np.percentile(times, 95)), 3),
+            "max_ms": round(float(times.max()), 3),
+            "fps": round(1000 / float(times.mean()), 1) if times.mean() > 0 else 0.0,
+        }
+
+
+class TrackSet:
+    """
+    Trajectories of all tracks in compact form: points sorted by
+    (track, frame) with a CSR offset index per track, plus the track id
+    of every detection row of the source DetectionStore.
+    """
+    def __init__(self, row_track, frames, xy, cls, fps=None):
+        self.row_track = row_track
+        rows = np.flatnonzero(row_track >= 0)
+        order = np.lexsort((frames[rows], row_track[rows]))
+        rows = rows[order]
+        self.track = row_track[rows]
+        self.frame = frames[rows]
+        self.xy = xy[rows]
+        self.cls = cls[rows]
+        self.fps = fps
+        self.ids, starts = np.unique(self.track, return_index=True)
+        self.offsets = np.append(starts, len(rows))
+        self._index = {int(tid): i for i, tid in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def trajectory(self, track_id):
+        """
+        (frames, xy) of one track.
+        """
+        i = self._index[int(track_id)]
+        s = slice(self.offsets[i], self.offsets[i + 1])
+        return self.frame[s], self.xy[s]
+
+    def distances(self):
+        """
+        Distance covered by every track, in the units of xy.
+        """
+        step = np.hypot(*np.diff(self.xy, axis=0).T)
+        # Do not count the jump between the last point of one track and the next
+        same_track = self.track[1:] == self.track[:-1]
+        per_point = np.where(same_track, step, 0.0)
+        point_track = np.repeat(np.arange(len(self.ids)), np.diff(self.offsets))
+        return np.bincount(point_track[1:], weights=per_point, minlength=len(self.ids))
+
+    def durations(self):
+        """
+        Frames between the first and last sighting of every track.
+        """
+        first = self.frame[self.offsets[:-1]]
+        last = self.frame[self.offsets[1:] - 1]
+        return last - first
+
+    def speeds(self):
+        """
+        Mean speed per track in xy units per second (per frame without fps).
+        """
+        duration = self.durations().astype(np.float64)
+        if self.fps:
+            duration = duration / self.fps
+        return np.divide(self.distances(), duration, out=np.zeros(len(self.ids)), where=duration > 0)
+
+    def heatmap(self, track_id, to_pitch):
+        """
+        PitchHeatmap of one track; to_pitch maps an (n, 2) array of xy to
+        pitch coordinates.
+        """
+        _, xy = self.trajectory(track_id)
+        pitch_xy = to_pitch(xy)
+        heatmap = PitchHeatmap()
+        heatmap.update(pitch_xy[:, 0], pitch_xy[:, 1])
+        return heatmap
+
+    def summary(self):
+        distances, speeds = self.distances(), self.speeds()
+        points = np.diff(self.offsets)
+        return [
+            {
+                "track_id": int(tid),
+                "class": CLASS_NAMES.get(int(self.cls[self.offsets[i]]), str(int(self.cls[self.offsets[i]]))),
+                "points": int(points[i]),
+                "distance": round(float(distances[i]), 1),
+                "speed": round(float(speeds[i]), 2),
+            }
+            for i, tid in enumerate(self.ids)
+        ]
+
+
+def track_store(store, fps=None, min_hits=3, calibration=None, **tracker_options):
+    """
+    Runs IoUTracker over every analysed frame of a DetectionStore.
+    Tracks seen in fewer than min_hits frames are discarded. With a
+    PitchCalibration, trajectories are in metres (so speeds are m/s),
+    otherwise in pixels.
+    Returns (TrackSet, tracker) so association timing can be reported.
+    """
+    tracker = IoUTracker(**tracker_options)
+    columns = store.columns()
+    row_track = np.full(store.num_detections, -1, dtype=np.int64)
+    last_frame = None
+    for frame_id in store.analysed_frames().tolist():
+        s = store.frame_slice(frame_id)
+        steps = 1 if last_frame is None else frame_id - last_frame
+        row_track[s] = tracker.update(columns["xywh"][s], columns["conf"][s], columns["cls"][s], steps)
+        last_frame = frame_id
+
+    ids, hits = np.unique(row_track[row_track >= 0], return_counts=True)
+    short = ids[hits < min_hits]
+    row_track[np.isin(row_track, short)] = -1
+    if calibration is None:
+        xy = columns["xywh"][:, :2].astype(np.float64)
+    else:
+        xy = calibration.for_frame_size(store.frame_size).to_pitch(columns["xywh"][:, :2])
+    return TrackSet(row_track, columns["frame"], xy, columns["cls"], fps=fps), tracker
@@ -0,0 +1,47 @@
+# upload_store.py
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from detection_cache import remember_file_hash
+
+UPLOAD_DIR = Path(tempfile.gettempdir()) / "ai_football_analyzer" / "uploads"
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def save_upload(uploaded_file, upload_dir=UPLOAD_DIR, chunk_size=CHUNK_SIZE):
+    """
+    Streams a file-like upload to upload_dir/<sha256><suffix> in chunks.
+    The file is hashed while it is written to a private temp file, which
+    is then renamed into place, so concurrent sessions never see a partial
+    file and an already stored upload is not written again.
+    """
+    upload_dir = Path(upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    suffix = Path(getattr(uploaded_file, "name", "")).suffix.lower() or ".mp4"
+
+    uploaded_file.seek(0)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: uploaded_file.read(chunk_size), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        target = upload_dir / f"{digest.hexdigest()}{suffix}"
+        if target.exists():
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, target)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        uploaded_file.seek(0)
+
+    # The content hash is known now; the detection cache need not re-read the file
+    remember_file_hash(target, digest.hexdigest())
+    return target
@@ -0,0 +1,326 @@
+# video_engine.py
+
+import queue
+import threading
+import time
+
+import cv2
+
+from profiling import profiler
+
+# Frame size used by the video detection path (16:9, 720 px wide)
+FRAME_SIZE = (720, int(720 * (9/16)))
+
+_STOP = object()
+
+# Size of the grayscale thumbnail used for motion detection
+MOTION_SIZE = (64, 36)
+
+
+class FrameSampler:
+    """
+    Chooses which decoded frames are sent to the model.
+
+    all:        every frame
+    stride:     every `stride`-th frame
+    target_fps: about `target_fps` frames per second of video
+    motion:     frames whose mean absolute difference to the last analysed
+                frame exceeds `motion_threshold` (0-255 grayscale), and at
+                least one frame every `max_gap` frames
+
+    Skipped frames are only grab()bed, not decoded, except in motion mode,
+    which has to look at the pixels.
+    """
+    MODES = ("all", "stride", "target_fps", "motion")
+
+    def __init__(self, mode="all", stride=1, target_fps=5.0, motion_threshold=6.0, max_gap=30):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        self.mode = mode
+        self.stride = max(1, int(stride))
+        self.target_fps = target_fps
+        self.motion_threshold = motion_threshold
+        self.max_gap = max(1, int(max_gap))
+        self._step = 1
+        self._last_thumb = None
+        self._last_selected = None
+
+    @property
+    def needs_pixels(self):
+        return self.mode == "motion"
+
+    def start(self, source_fps):
+        if self.mode == "stride":
+            self._step = self.stride
+        elif self.mode == "target_fps" and source_fps and self.target_fps:
+            self._step = max(1, int(round(source_fps / self.target_fps)))
+        else:
+            self._step = 1
+        self._last_thumb = None
+        self._last_selected = None
+
+    def select_index(self, frame_idx):
+        """
+        Decision from the frame index alone (all modes except motion).
+        """
+        return frame_idx % self._step == 0
+
+    def select_frame(self, frame_idx, image):
+        thumb = cv2.cvtColor(cv2.resize(image, MOTION_SIZE, interpolation=cv2.INTER_AREA),
+                             cv2.COLOR_BGR2GRAY)
+        if (self._last_thumb is None
+                or frame_idx - self._last_selected >= self.max_gap
+                or cv2.absdiff(thumb, self._last_thumb).mean() > self.motion_threshold):
+            self._last_thumb = thumb
+            self._last_selected = frame_idx
+            return True
+        return False
+
+    def key(self):
+        """
+        Settings that change the analysed frames, for cache keys.
+        """
+        if self.mode == "stride":
+            return {"mode": self.mode, "stride": self.stride}
+        if self.mode == "target_fps":
+            return {"mode": self.mode, "target_fps": self.target_fps}
+        if self.mode == "motion":
+            return {"mode": self.mode, "threshold": self.motion_threshold, "max_gap": self.max_gap}
+        return {"mode": self.mode}
+
+
+class StageStats:
+    """
+    Frame counter and busy time for one pipeline stage.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, frames, seconds):
+        with self._lock:
+            self.frames += frames
+            self.busy += seconds
+
+    @property
+    def fps(self):
+        return self.frames / self.busy if self.busy > 0 else 0.0
+
+    def as_dict(self):
+        return {"frames": self.frames, "busy_s": round(self.busy, 3), "fps": round(self.fps, 1)}
+
+
+class VideoAnalysisEngine:
+    """
+    Pipelined video inference: a decoder thread feeds a bounded queue,
+    an inference thread runs batched model.predict calls and a draw thread
+    plots the results. Iterate over run() to consume the annotated frames.
+    With a PreviewThrottle, only frames due for display are drawn, and they
+    are handed out JPEG-encoded.
+    """
+    def __init__(self, model, conf=0.4, batch_size=8, queue_size=32,
+                 frame_size=FRAME_SIZE, draw=True, sampler=None, preview=None):
+        self.model = model
+        self.conf = conf
+        self.batch_size = max(1, int(batch_size))
+        self.queue_size = max(self.batch_size, int(queue_size))
+        self.frame_size = frame_size
+        self.draw = draw
+        self.sampler = sampler or FrameSampler()
+        self.preview = preview
+        self.stages = {}
+        self.wall_time = 0.0
+        self.frames_out = 0
+        self.frames_total = 0
+        self._stop = threading.Event()
+        self._error = None
+
+    def _reset(self):
+        self.stages = {name: StageStats(name) for name in ("decode", "inference", "draw", "render")}
+        self.wall_time = 0.0
+        self.frames_out = 0
+        self.frames_total = 0
+        self._stop.clear()
+        self._error = None
+
+    def _put(self, q, item):
+        # Block on a full queue, but give up as soon as the pipeline is stopped
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _fail(self, e):
+        if self._error is None:
+            self._error = e
+        self._stop.set()
+
+    def _decode(self, video_path, out_q):
+        stats = self.stages["decode"]
+        video_cap = cv2.VideoCapture(str(video_path))
+        try:
+            if not video_cap.isOpened():
+                raise IOError(f"Could not open video: {video_path}")
+            sampler = self.sampler
+            sampler.start(video_cap.get(cv2.CAP_PROP_FPS))
+            frame_idx = 0
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                selected = sampler.needs_pixels or sampler.select_index(frame_idx)
+                # grab() advances without decoding; retrieve() only for frames we use
+                with profiler.stage("video.grab"):
+                    grabbed = video_cap.grab()
+                if not grabbed:
+                    break
+                image = None
+                if selected:
+                    with profiler.stage("video.decode"):
+                        success, image = video_cap.retrieve()
+                    if not success:
+                        break
+                    if sampler.needs_pixels:
+                        with profiler.stage("video.motion"):
+                            selected = sampler.select_frame(frame_idx, image)
+                if selected and self.frame_size:
+                    with profiler.stage("video.resize"):
+                        image = cv2.resize(image, self.frame_size)
+                stats.add(1, time.perf_counter() - start)
+                frame_idx += 1
+                self.frames_total = frame_idx
+                if selected and not self._put(out_q, (frame_idx - 1, image)):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            video_cap.release()
+            self._put(out_q, _STOP)
+
+    def _infer(self, in_q, out_q):
+        stats = self.stages["inference"]
+        done = False
+        try:
+            while not done:
+                item = self._get(in_q)
+                if item is _STOP:
+                    break
+                batch = [item]
+                # Fill the batch with whatever the decoder has already queued
+                while len(batch) < self.batch_size:
+                    try:
+                        item = in_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        done = True
+                        break
+                    batch.append(item)
+
+                start = time.perf_counter()
+                with profiler.stage("model.predict"):
+                    results = self.model.predict([image for _, image in batch], conf=self.conf, verbose=False)
+                stats.add(len(batch), time.perf_counter() - start)
+
+                for (frame_idx, image), result in zip(batch, results):
+                    if not self._put(out_q, (frame_idx, image, result)):
+                        return
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(out_q, _STOP)
+
+    def _plot(self, in_q, out_q):
+        stats = self.stages["draw"]
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _STOP:
+                    break
+                frame_idx, image, result = item
+                plotted = None
+                if self.draw and (self.preview is None or self.preview.due()):
+                    start = time.perf_counter()
+                    with profiler.stage("result.plot"):
+                        plotted = result.plot()
+                    if self.preview is not None:
+                        with profiler.stage("preview.encode"):
+                            plotted = self.preview.encode(plotted)
+                    stats.add(1, time.perf_counter() - start)
+                if not self._put(out_q, (frame_idx, image, result, plotted)):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(out_q, _STOP)
+
+    def run(self, video_path):
+        """
+        Yields (frame_idx, frame, result, plotted) in frame order.
+        plotted is the BGR annotated frame, or None when draw is disabled.
+        With a preview throttle it is JPEG bytes for frames due for display
+        and None for all others.
+        """
+        self._reset()
+        frames_q = queue.Queue(maxsize=self.queue_size)
+        results_q = queue.Queue(maxsize=self.queue_size)
+        plotted_q = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._decode, args=(video_path, frames_q), daemon=True),
+            threading.Thread(target=self._infer, args=(frames_q, results_q), daemon=True),
+            threading.Thread(target=self._plot, args=(results_q, plotted_q), daemon=True),
+        ]
+        render = self.stages["render"]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                item = self._get(plotted_q)
+                if item is _STOP:
+                    break
+                self.frames_out += 1
+                yielded = time.perf_counter()
+                yield item
+                render.add(1, time.perf_counter() - yielded)
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join(timeout=5)
+            self.wall_time = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+
+    def report(self):
+        """
+        Per-stage frames per second plus the end-to-end rate of the last run.
+        """
+        report = {name: stats.as_dict() for name, stats in self.stages.items()}
+        report["total"] = {
+            "frames": self.frames_out,
+            "wall_s": round(self.wall_time, 3),
+            "fps": round(self.frames_out / self.wall_time, 1) if self.wall_time > 0 else 0.0,
+        }
+        # Full-frame analysis would also have run inference on every skipped frame
+        inference_fps = self.stages["inference"].fps if self.stages else 0.0
+        skipped = self.frames_total - self.frames_out
+        estimated_full = self.wall_time + (skipped / inference_fps if inference_fps else 0.0)
+        report["sampling"] = {
+            **self.sampler.key(),
+            "frames_total": self.frames_total,
+            "frames_analysed": self.frames_out,
+            "estimated_full_s": round(estimated_full, 3),
+            "speedup_vs_full": round(estimated_full / self.wall_time, 2) if self.wall_time > 0 else 1.0,
+        }
+        return report